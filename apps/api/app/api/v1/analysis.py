@@ -80,7 +80,7 @@ async def list_analyses(
                 id=a.id,
                 website_url=a.website_url,
                 status=a.status,
-                progress=a.progress,
+                progress=service._current_progress(a),
                 estimated_time_seconds=None,
                 created_at=a.created_at,
             )
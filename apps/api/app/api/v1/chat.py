@@ -6,11 +6,13 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 
 from typing import Optional
 from uuid import UUID
-import json
 
 from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+import orjson
 
+from app.db import database
 from app.db.database import get_db
 from app.schemas.chat import (
     ConversationCreate,
@@ -18,6 +20,7 @@ from app.schemas.chat import (
     ConversationDetailResponse,
     ConversationListResponse,
     MessageCreate,
+    MESSAGE_LIST_ADAPTER,
     MessageResponse,
     SendMessageResponse,
 )
@@ -55,8 +58,10 @@ class ConnectionManager:
     async def send_message(self, message: dict, conversation_id: UUID):
         """Send message to all connections in a conversation."""
         if conversation_id in self.active_connections:
+            # Serialized once for every connection
+            text = orjson.dumps(message).decode()
             for connection in self.active_connections[conversation_id]:
-                await connection.send_json(message)
+                await connection.send_text(text)
 
     async def broadcast_typing(self, conversation_id: UUID, is_typing: bool):
         """Broadcast typing indicator."""
@@ -123,7 +128,7 @@ async def list_conversations(
                 title=c.title,
                 ring_phase=c.ring_phase,
                 status=c.status,
-                message_count=len(c.messages) if hasattr(c, "messages") else 0,
+                message_count=c.message_count,
                 created_at=c.created_at,
                 updated_at=c.updated_at,
             )
@@ -200,6 +205,45 @@ async def send_message(
         )
 
 
+@router.post(
+    "/conversations/{conversation_id}/messages/stream",
+    summary="Send message (streaming)",
+    description="Send a message and stream the AI response as server-sent events.",
+)
+async def stream_message(
+    conversation_id: UUID,
+    message: MessageCreate,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Send message and stream the AI response."""
+    # The stream outlives the request's dependencies, so it gets its own session
+    db = database.async_session_factory()
+    events = ChatService(db).stream_message(conversation_id, current_user.id, message)
+    try:
+        # Run up to the first event so a missing conversation is still a 404
+        first_event = await events.__anext__()
+    except NotFoundError as e:
+        await db.close()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except Exception:
+        await db.close()
+        raise
+
+    async def event_stream():
+        try:
+            yield b"data: " + orjson.dumps(first_event) + b"\n\n"
+            async for event in events:
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        finally:
+            await events.aclose()
+            await db.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get(
     "/conversations/{conversation_id}/messages",
     response_model=PaginatedResponse[MessageResponse],
@@ -217,10 +261,10 @@ async def get_messages(
     service = ChatService(db)
     try:
         conversation = await service.get_conversation(conversation_id, current_user.id)
-        messages = sorted(conversation.messages, key=lambda m: m.created_at)
+        messages = conversation.messages  # loaded in created_at order
         paginated = messages[offset:offset + limit]
         return PaginatedResponse(
-            data=[MessageResponse.model_validate(m) for m in paginated],
+            data=MESSAGE_LIST_ADAPTER.validate_python(paginated),
             pagination=Pagination(
                 total=len(messages),
                 limit=limit,
@@ -259,7 +303,7 @@ async def update_ring_phase(
                 title=conversation.title,
                 ring_phase=conversation.ring_phase,
                 status=conversation.status,
-                message_count=len(conversation.messages),
+                message_count=conversation.message_count,
                 created_at=conversation.created_at,
                 updated_at=conversation.updated_at,
             )
@@ -312,7 +356,9 @@ async def websocket_chat(
     # Verify token
     try:
         payload = decode_token(token)
-        user_id = UUID(payload.get("sub"))
+        user_id = payload.get("sub")
+        if not isinstance(user_id, UUID):
+            raise ValueError("Invalid token subject")
     except Exception:
         await websocket.close(code=4001, reason="Invalid token")
         return
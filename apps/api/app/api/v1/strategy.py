@@ -188,7 +188,7 @@ async def export_strategy(
     service = StrategyService(db)
 
     try:
-        strategy = await service.get_strategy(strategy_id, current_user.id)
+        await service.get_strategy_meta(strategy_id, current_user.id)
     except NotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -35,6 +35,10 @@ class Settings(BaseSettings):
             url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
         return url
 
+    DB_POOL_SIZE: int = 20  # Pooled Postgres connections kept open
+    DB_MAX_OVERFLOW: int = 10  # Extra connections allowed under burst load
+    DB_POOL_RECYCLE_SECONDS: int = 3600  # Reconnect before idle server-side timeouts
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
 
@@ -43,6 +47,10 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    JWT_CACHE_SIZE: int = 10_000  # Verified token claims kept in memory (0 disables)
+    JWT_CACHE_TTL_SECONDS: float = 5
+    PASSWORD_HASH_TIME_COST: int = 3  # argon2 passes per hash
+    PASSWORD_HASH_MEMORY_KIB: int = 65536  # argon2 memory per hash (tests lower both)
 
     # Clerk Authentication
     CLERK_SECRET_KEY: str = "sk_test_ygPazt9fxEjqbZkcfs5y3vcHsllyvcNg5nlF8MJLSv"
@@ -57,6 +65,11 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     OPENAI_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
+    RESPONSE_CACHE_SIZE: int = 512  # Cached chat responses (0 disables)
+    RESPONSE_CACHE_TTL_SECONDS: int = 900
+    ANALYSIS_CONTEXT_CACHE_TTL_SECONDS: int = 300
+    STREAM_COALESCE_CHARS: int = 48  # Flush streamed text once this much is buffered
+    STREAM_COALESCE_SECONDS: float = 0.02  # ...or once this long since the last flush
 
     @property
     def AI_MODEL(self) -> str:
@@ -4,14 +4,21 @@ Security utilities - JWT, password hashing, Clerk authentication
 AI App Development powered by ServiceVision (https://www.servicevision.net)
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional, Any
 from uuid import UUID
+import base64
+import calendar
+import hashlib
+import hmac
+import time
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import jwt as pyjwt
@@ -22,7 +29,12 @@ from app.db.database import get_db
 from app.models.user import User
 
 # Password hashing context - using argon2 (no 72-byte limit like bcrypt)
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__rounds=settings.PASSWORD_HASH_TIME_COST,
+    argon2__memory_cost=settings.PASSWORD_HASH_MEMORY_KIB,
+)
 
 # Bearer token scheme
 bearer_scheme = HTTPBearer(auto_error=False)
@@ -69,6 +81,44 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# HS256 tokens are signed from a precomputed HMAC key state; other algorithms
+# go through jose
+_HS256_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+_HS256_SIGNER = hmac.new(settings.JWT_SECRET_KEY.encode(), digestmod=hashlib.sha256)
+
+
+def _encode_subject(subject: str | UUID) -> str:
+    """Subject claim for a token; user IDs are written as compact hex."""
+    return subject.hex if isinstance(subject, UUID) else str(subject)
+
+
+def _parse_subject(subject: Any) -> Any:
+    """Parse a UUID subject claim (hex or dashed); other subjects are left as-is."""
+    if isinstance(subject, str):
+        try:
+            return UUID(hex=subject)
+        except ValueError:
+            pass
+    return subject
+
+
+def _encode_jwt(claims: dict[str, Any]) -> str:
+    """Encode and sign JWT claims with the configured secret and algorithm."""
+    for claim in ("exp", "iat"):
+        if isinstance(claims.get(claim), datetime):
+            claims[claim] = calendar.timegm(claims[claim].utctimetuple())
+
+    if settings.JWT_ALGORITHM != "HS256":
+        return jwt.encode(claims, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+    payload = base64.urlsafe_b64encode(orjson.dumps(claims)).rstrip(b"=")
+    signing_input = _HS256_HEADER + b"." + payload
+    signer = _HS256_SIGNER.copy()
+    signer.update(signing_input)
+    signature = base64.urlsafe_b64encode(signer.digest()).rstrip(b"=")
+    return (signing_input + b"." + signature).decode("ascii")
+
+
 def create_access_token(
     subject: str | UUID,
     expires_delta: Optional[timedelta] = None,
@@ -81,7 +131,7 @@ def create_access_token(
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
     to_encode = {
-        "sub": str(subject),
+        "sub": _encode_subject(subject),
         "exp": expire,
         "type": "access",
         "iat": datetime.utcnow(),
@@ -90,7 +140,7 @@ def create_access_token(
     if extra_claims:
         to_encode.update(extra_claims)
 
-    return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return _encode_jwt(to_encode)
 
 
 def create_refresh_token(
@@ -104,13 +154,13 @@ def create_refresh_token(
         expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
 
     to_encode = {
-        "sub": str(subject),
+        "sub": _encode_subject(subject),
         "exp": expire,
         "type": "refresh",
         "iat": datetime.utcnow(),
     }
 
-    return jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return _encode_jwt(to_encode)
 
 
 def decode_clerk_token(token: str) -> dict[str, Any]:
@@ -146,21 +196,92 @@ def decode_clerk_token(token: str) -> dict[str, Any]:
         )
 
 
+class TokenClaimsCache:
+    """
+    In-process LRU cache of verified JWT claims with a short time-to-live.
+
+    Entries are keyed by a digest of the token, never the token itself, and
+    never outlive the token's own expiry. Rejections are cached too, so a bad
+    token doesn't repeatedly pay for signature verification.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[bytes, tuple[float, dict | str]] = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        """Build the cache key for a token."""
+        return hashlib.sha256(token.encode()).digest()[:16]
+
+    def get(self, key: bytes) -> Optional[dict | str]:
+        """Return the cached claims or rejection message, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def set(self, key: bytes, result: dict | str) -> None:
+        """Cache verified claims (dict) or a rejection message (str)."""
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl_seconds
+        if isinstance(result, dict) and "exp" in result:
+            ttl = min(ttl, result["exp"] - time.time())
+            if ttl <= 0:
+                return
+        self._entries[key] = (time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+
+
+_token_claims_cache = TokenClaimsCache(
+    maxsize=settings.JWT_CACHE_SIZE,
+    ttl_seconds=settings.JWT_CACHE_TTL_SECONDS,
+)
+
+
 def decode_token(token: str) -> dict[str, Any]:
-    """Decode and validate a JWT token (legacy internal tokens)."""
-    try:
-        payload = jwt.decode(
-            token,
-            settings.JWT_SECRET_KEY,
-            algorithms=[settings.JWT_ALGORITHM],
-        )
-        return payload
-    except JWTError as e:
+    """
+    Decode and validate a JWT token (legacy internal tokens).
+
+    A subject that is a UUID (as issued for users) is returned as a UUID.
+    """
+    cache_key = TokenClaimsCache.key(token)
+    result = _token_claims_cache.get(cache_key)
+
+    if result is None:
+        try:
+            result = jwt.decode(
+                token,
+                settings.JWT_SECRET_KEY,
+                algorithms=[settings.JWT_ALGORITHM],
+            )
+            # Parsed once here, so cache hits hand out a ready UUID
+            if "sub" in result:
+                result["sub"] = _parse_subject(result["sub"])
+        except JWTError as e:
+            result = f"Invalid token: {str(e)}"
+        _token_claims_cache.set(cache_key, result)
+
+    if isinstance(result, str):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Invalid token: {str(e)}",
+            detail=result,
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return dict(result)
 
 
 async def get_or_create_clerk_user(
@@ -253,7 +374,7 @@ async def get_current_user(
             )
 
         user_id = payload.get("sub")
-        if not user_id:
+        if not isinstance(user_id, UUID):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token payload",
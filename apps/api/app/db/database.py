@@ -5,6 +5,7 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 """
 
 import uuid
+import orjson
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import TypeDecorator, String
@@ -46,12 +47,34 @@ class GUID(TypeDecorator):
             return value
         return uuid.UUID(value)
 
+
+def _json_serializer(value) -> str:
+    """Serialize JSON column values with orjson (SQLAlchemy expects a str)."""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+# Connection pool sizing only applies to Postgres; SQLite (tests, local dev)
+# keeps its driver's default pool
+_pool_options = (
+    {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+    if settings.async_database_url.startswith("postgresql")
+    else {}
+)
+
 # Create async engine (use async_database_url to ensure asyncpg driver)
 engine = create_async_engine(
     settings.async_database_url,
     echo=settings.DEBUG,
     future=True,
     pool_pre_ping=True,
+    # JSON columns (e.g. Analysis.results) are encoded/decoded with orjson
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+    **_pool_options,
 )
 
 # Create async session factory
@@ -23,6 +23,9 @@ try:
 
     from app.db.database import init_db
     print("Database module imported", flush=True)
+
+    from app.services.analysis_service import close_http_client, shutdown_parse_pool
+    from app.services.strategy_service import start_strategy_workers, stop_strategy_workers
 except Exception as e:
     print(f"STARTUP ERROR: {e}", flush=True)
     traceback.print_exc()
@@ -69,7 +72,7 @@ async def health_check():
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup."""
+    """Initialize database tables and start strategy workers on startup."""
     print("Initializing database tables...", flush=True)
     try:
         await init_db()
@@ -77,3 +80,12 @@ async def startup_event():
     except Exception as e:
         print(f"Database initialization error: {e}", flush=True)
         traceback.print_exc()
+    start_strategy_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the shared outbound HTTP client and parsing and strategy workers."""
+    await close_http_client()
+    shutdown_parse_pool()
+    stop_strategy_workers()
@@ -5,7 +5,7 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 """
 
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, JSON, Enum, Index
 from sqlalchemy.orm import relationship
 import uuid
 import enum
@@ -44,5 +44,18 @@ class Analysis(Base):
     user = relationship("User", back_populates="analyses")
     strategies = relationship("Strategy", back_populates="analysis")
 
+    __table_args__ = (
+        # Latest completed analysis per user (chat context lookup)
+        Index(
+            "ix_analyses_user_completed",
+            user_id,
+            completed_at.desc(),
+            postgresql_where=(status == AnalysisStatus.COMPLETED),
+            sqlite_where=(status == AnalysisStatus.COMPLETED),
+        ),
+        # Per-user analysis history, newest first
+        Index("ix_analyses_user_created", user_id, created_at.desc()),
+    )
+
     def __repr__(self) -> str:
         return f"<Analysis {self.id} ({self.status})>"
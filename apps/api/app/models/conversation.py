@@ -45,13 +45,20 @@ class Conversation(Base):
     summary = Column(Text, nullable=True)
     business_context = Column(Text, nullable=True)  # Stores initial context from website analysis
     extra_data = Column(JSON, default=dict)
+    # Denormalized count of messages, incremented in SQL as messages are added
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     user = relationship("User", back_populates="conversations")
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    messages = relationship(
+        "Message",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        order_by="Message.created_at",
+    )
 
     def __repr__(self) -> str:
         return f"<Conversation {self.id}>"
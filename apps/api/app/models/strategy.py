@@ -15,6 +15,9 @@ from app.db.database import Base, GUID
 
 class StrategyStatus(str, enum.Enum):
     DRAFT = "draft"
+    GENERATING = "generating"
+    READY = "ready"
+    FAILED = "failed"
     ACTIVE = "active"
     COMPLETED = "completed"
     ARCHIVED = "archived"
@@ -48,7 +51,12 @@ class Strategy(Base):
     analysis_id = Column(GUID(), ForeignKey("analyses.id"), nullable=True)
     title = Column(String(255), nullable=True)
     summary = Column(Text, nullable=True)
+    executive_summary = Column(Text, nullable=True)
+    vision_statement = Column(Text, nullable=True)
+    key_strengths = Column(JSON, nullable=True)
+    critical_gaps = Column(JSON, nullable=True)
     recommendations = Column(JSON, nullable=True)
+    ninety_day_priorities = Column(JSON, nullable=True)
     status = Column(Enum(StrategyStatus), default=StrategyStatus.DRAFT)
 
     created_at = Column(DateTime, default=datetime.utcnow)
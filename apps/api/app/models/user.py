@@ -6,7 +6,7 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, JSON
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, JSON, LargeBinary, Index
 from sqlalchemy.orm import relationship
 import uuid
 
@@ -28,8 +28,10 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     settings = Column(JSON, default=dict)
 
-    # Password reset
-    password_reset_token = Column(String(255), nullable=True)
+    # Password reset - the token is split into a plain, indexed selector used for the
+    # lookup and a verifier whose HMAC-SHA256 digest is compared in constant time
+    password_reset_selector = Column(String(32), nullable=True)
+    password_reset_verifier_hash = Column(LargeBinary(32), nullable=True)
     password_reset_expires = Column(DateTime, nullable=True)
 
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -41,5 +43,16 @@ class User(Base):
     analyses = relationship("Analysis", back_populates="user", cascade="all, delete-orphan")
     strategies = relationship("Strategy", back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Outstanding password resets only; rows without a reset stay out of the index
+        Index(
+            "ix_users_password_reset_selector",
+            password_reset_selector,
+            unique=True,
+            postgresql_where=password_reset_selector.isnot(None),
+            sqlite_where=password_reset_selector.isnot(None),
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<User {self.email}>"
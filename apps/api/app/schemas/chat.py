@@ -7,7 +7,7 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 from datetime import datetime
 from typing import Optional, Any
 from uuid import UUID
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 from app.models.conversation import RingPhase, ConversationStatus, MessageRole
 
@@ -32,6 +32,10 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+# Validates a whole list of messages in one pydantic-core call
+MESSAGE_LIST_ADAPTER = TypeAdapter(list[MessageResponse])
+
+
 class ConversationCreate(BaseModel):
     """Create conversation request."""
 
@@ -7,7 +7,7 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 from datetime import datetime, date
 from typing import Optional, Any
 from uuid import UUID
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 from app.models.strategy import Priority, Effort, ActionStatus, StrategyStatus
 
@@ -50,6 +50,11 @@ class ActionItemResponse(BaseModel):
         from_attributes = True
 
 
+# Validate whole lists of recommendations / action items in one pydantic-core call
+RECOMMENDATION_LIST_ADAPTER = TypeAdapter(list[RecommendationResponse])
+ACTION_ITEM_LIST_ADAPTER = TypeAdapter(list[ActionItemResponse])
+
+
 class StrategyResponse(BaseModel):
     """Full strategy response."""
 
@@ -11,9 +11,17 @@ This module implements the "Rings of Growth" conversational framework with:
 - Optimized RAG context injection
 """
 
+import hashlib
+import io
 import json
 import re
-from typing import Optional, AsyncGenerator
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Optional, AsyncGenerator
 from uuid import UUID
 from enum import Enum
 
@@ -57,6 +65,12 @@ class UserIntent(str, Enum):
     OFF_TOPIC = "off_topic"  # Message unrelated to business
 
 
+# Interned intent strings, so intent comparisons downstream hit the identity
+# fast path of str equality
+_INTENT_STR = {intent: sys.intern(intent.value) for intent in UserIntent}
+_STATEMENT = _INTENT_STR[UserIntent.STATEMENT]
+
+
 # ============================================================================
 # RING PHASE SYSTEM PROMPTS
 # ============================================================================
@@ -247,20 +261,55 @@ The Rings are iterative. After optimization, you may:
 """
 }
 
+# The phase prompts above are fully static, so each is sent as its own content
+# block marked as a prompt-cache breakpoint (honoured by Anthropic/Bedrock,
+# stripped by LiteLLM for providers without support). Per-request context goes
+# after the conversation history so the cached prefix stays byte-identical
+# across turns.
+SYSTEM_PROMPT_BLOCKS: dict[RingPhase, list[dict]] = {
+    phase: [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+    for phase, prompt in SYSTEM_PROMPTS.items()
+}
+
+# Fixed text around the per-request website analysis context
+RAG_CONTEXT_INTRO = "\n\n---\nCONTEXT FROM WEBSITE ANALYSIS:\n"
+RAG_CONTEXT_OUTRO = (
+    "\n---\nUse this context to personalize your responses. "
+    "Reference specific details from their website when relevant.\n"
+)
+
 
 # ============================================================================
 # PRE-PROCESSING
 # ============================================================================
 
+# Messages up to this many words only get intent detection
+MAX_QUICK_REPLY_WORDS = 2
+
+# Distinct recent messages whose pre-processing results are kept
+PREPROCESS_CACHE_SIZE = 256
+
+
+@dataclass(slots=True, frozen=True)
+class PreprocessResult:
+    """Result of pre-processing a user message."""
+    original_message: str
+    intent: str
+    sentiment: str
+    references_previous: bool
+    message_length: str
+    enrichment_notes: tuple[str, ...]
+
+
 def preprocess_user_message(
     message: str,
     conversation_history: list[Message],
     ring_phase: RingPhase
-) -> dict:
+) -> PreprocessResult:
     """
     Pre-process user message to extract intent, context, and enrichment.
 
-    Returns a dict with:
+    Returns a PreprocessResult with:
     - original_message: The raw user input
     - intent: Detected user intent
     - key_topics: Main topics/entities mentioned
@@ -268,20 +317,35 @@ def preprocess_user_message(
     - references_previous: Whether they're referencing earlier conversation
     - message_length: short/medium/long
     - enrichment_notes: Context for the AI about this message
+
+    The result depends only on the message text, so it is cached; retried or
+    repeated messages skip the analysis entirely.
     """
+    return _preprocess_message(message)
+
+
+@lru_cache(maxsize=PREPROCESS_CACHE_SIZE)
+def _preprocess_message(message: str) -> PreprocessResult:
+    """Analyze a user message (see preprocess_user_message)."""
     message_lower = message.lower().strip()
+    word_count = len(message_lower.split())
 
     # Detect intent
     intent = _detect_intent(message_lower)
 
-    # Detect sentiment
-    sentiment = _detect_sentiment(message_lower)
+    if word_count <= MAX_QUICK_REPLY_WORDS:
+        # Quick replies ("yes", "sounds good", "why?") carry too little text for
+        # sentiment or back-references to be meaningful, so skip those scans
+        sentiment = "neutral"
+        references_previous = False
+    else:
+        # Detect sentiment
+        sentiment = _detect_sentiment(message_lower)
 
-    # Check for references to previous conversation
-    references_previous = _check_references_previous(message_lower)
+        # Check for references to previous conversation
+        references_previous = _check_references_previous(message_lower)
 
     # Categorize message length
-    word_count = len(message.split())
     if word_count <= 5:
         message_length = "short"
     elif word_count <= 30:
@@ -307,90 +371,112 @@ def preprocess_user_message(
     if references_previous:
         enrichment_notes.append("User is referencing earlier conversation - maintain continuity")
 
-    return {
-        "original_message": message,
-        "intent": intent.value,
-        "sentiment": sentiment,
-        "references_previous": references_previous,
-        "message_length": message_length,
-        "enrichment_notes": enrichment_notes,
-    }
+    return PreprocessResult(
+        original_message=message,
+        intent=_INTENT_STR[intent],
+        sentiment=sentiment,
+        references_previous=references_previous,
+        message_length=message_length,
+        enrichment_notes=tuple(enrichment_notes),
+    )
+
+
+# Intent indicators in order of specificity: (intent, message prefixes, patterns
+# that may match anywhere). The first intent with any match wins.
+_INTENT_PATTERNS = (
+    (UserIntent.CONCERN, (), (
+        r"worried|concerned|afraid|scared|nervous|unsure|don't know|struggling|problem|issue|difficult|hard",
+        r"not working|doesn't work|failed|failing",
+    )),
+    (UserIntent.DISAGREEMENT, (
+        "no", "nope", "not really", "i disagree", "that's not", "actually",
+    ), (
+        r"but|however|although", r"don't think so", r"not sure about that",
+    )),
+    (UserIntent.AGREEMENT, (
+        "yes", "yeah", "yep", "sure", "ok", "okay", "right", "exactly", "agreed",
+        "absolutely", "definitely", "that's right", "sounds good",
+    ), (
+        r"makes sense", r"i agree", r"you're right",
+    )),
+    (UserIntent.REQUEST, (), (
+        r"can you|could you|please|help me|i need|i want|give me|show me",
+        r"recommend", r"suggest", r"create", r"make", r"build",
+    )),
+    (UserIntent.QUESTION, (
+        "what", "how", "why", "when", "where", "who", "which", "can", "could",
+        "would", "should", "is", "are", "do", "does",
+    ), (
+        r"\?$", r"tell me", r"explain", r"help me understand",
+    )),
+)
+
+
+def _intent_regex(intent_patterns) -> re.Pattern:
+    """
+    Compile the unanchored indicators of several intents into one regex.
+
+    Every intent is a lookahead anchored at the start of the message, so a
+    single match() tries them in order of specificity instead of returning
+    whichever indicator happens to occur first in the text. Patterns are
+    case-sensitive; callers match against the already-lowercased message.
+    """
+    return re.compile(
+        "|".join(
+            f"(?P<{intent.value}>(?=.*?(?:{'|'.join(patterns)})))"
+            for intent, _, patterns in intent_patterns
+        ),
+        re.DOTALL,
+    )
+
 
+_INTENT_RE = _intent_regex(_INTENT_PATTERNS)
 
-def _detect_intent(message: str) -> UserIntent:
-    """Detect the primary intent of the user message."""
-    # Question indicators
-    question_patterns = [
-        r'\?$', r'^(what|how|why|when|where|who|which|can|could|would|should|is|are|do|does)',
-        r'tell me', r'explain', r'help me understand'
-    ]
-
-    # Request indicators
-    request_patterns = [
-        r'(can you|could you|please|help me|i need|i want|give me|show me)',
-        r'recommend', r'suggest', r'create', r'make', r'build'
-    ]
-
-    # Concern indicators
-    concern_patterns = [
-        r"(worried|concerned|afraid|scared|nervous|unsure|don't know|struggling|problem|issue|difficult|hard)",
-        r"(not working|doesn't work|failed|failing)"
-    ]
-
-    # Agreement indicators
-    agreement_patterns = [
-        r'^(yes|yeah|yep|sure|ok|okay|right|exactly|agreed|absolutely|definitely|that\'s right|sounds good)',
-        r'makes sense', r'i agree', r'you\'re right'
-    ]
-
-    # Disagreement indicators
-    disagreement_patterns = [
-        r'^(no|nope|not really|i disagree|that\'s not|actually)',
-        r"(but|however|although)", r"don't think so", r"not sure about that"
-    ]
-
-    # Check patterns in order of specificity
-    for pattern in concern_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            return UserIntent.CONCERN
-
-    for pattern in disagreement_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            return UserIntent.DISAGREEMENT
-
-    for pattern in agreement_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            return UserIntent.AGREEMENT
-
-    for pattern in request_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            return UserIntent.REQUEST
-
-    for pattern in question_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            return UserIntent.QUESTION
+# Prefix checks for intents with start-of-message indicators, each paired with
+# the regex for the more specific intents that would still take precedence.
+_INTENT_PREFIX_CHECKS = tuple(
+    (intent, prefixes, _intent_regex(_INTENT_PATTERNS[:i]))
+    for i, (intent, prefixes, _) in enumerate(_INTENT_PATTERNS)
+    if prefixes
+)
 
+
+def _detect_intent(message_lower: str) -> UserIntent:
+    """Detect the primary intent of the lowercased user message."""
+    # Short replies usually start with "yes", "no", "what", ... - a startswith()
+    # check settles those without scanning the less specific patterns.
+    for intent, prefixes, more_specific_re in _INTENT_PREFIX_CHECKS:
+        if message_lower.startswith(prefixes):
+            match = more_specific_re.match(message_lower)
+            return UserIntent(match.lastgroup) if match else intent
+
+    match = _INTENT_RE.match(message_lower)
+    if match:
+        return UserIntent(match.lastgroup)
     return UserIntent.STATEMENT
 
 
-def _detect_sentiment(message: str) -> str:
-    """Detect overall sentiment of the message."""
-    positive_words = [
-        'great', 'good', 'excellent', 'amazing', 'love', 'happy', 'excited',
-        'wonderful', 'fantastic', 'perfect', 'awesome', 'glad', 'pleased',
-        'thrilled', 'delighted', 'success', 'working', 'progress'
-    ]
+POSITIVE_WORDS = (
+    'great', 'good', 'excellent', 'amazing', 'love', 'happy', 'excited',
+    'wonderful', 'fantastic', 'perfect', 'awesome', 'glad', 'pleased',
+    'thrilled', 'delighted', 'success', 'working', 'progress'
+)
 
-    negative_words = [
-        'bad', 'terrible', 'awful', 'hate', 'frustrated', 'angry', 'worried',
-        'concerned', 'problem', 'issue', 'difficult', 'hard', 'failing',
-        'struggle', 'stuck', 'confused', 'overwhelmed', 'stressed'
-    ]
+NEGATIVE_WORDS = (
+    'bad', 'terrible', 'awful', 'hate', 'frustrated', 'angry', 'worried',
+    'concerned', 'problem', 'issue', 'difficult', 'hard', 'failing',
+    'struggle', 'stuck', 'confused', 'overwhelmed', 'stressed'
+)
 
-    message_lower = message.lower()
+# Whole-word matching so "hard" doesn't fire on "hardware" or "bad" on "badge"
+_POS_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, POSITIVE_WORDS)) + r")\b")
+_NEG_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, NEGATIVE_WORDS)) + r")\b")
 
-    pos_count = sum(1 for word in positive_words if word in message_lower)
-    neg_count = sum(1 for word in negative_words if word in message_lower)
+
+def _detect_sentiment(message_lower: str) -> str:
+    """Detect overall sentiment of the lowercased message."""
+    pos_count = len(_POS_RE.findall(message_lower))
+    neg_count = len(_NEG_RE.findall(message_lower))
 
     if pos_count > neg_count:
         return "positive"
@@ -399,34 +485,42 @@ def _detect_sentiment(message: str) -> str:
     return "neutral"
 
 
-def _check_references_previous(message: str) -> bool:
-    """Check if message references previous conversation."""
-    reference_patterns = [
-        r'(you said|you mentioned|earlier|before|last time|we talked about)',
-        r'(that thing|the thing|what you|as you|like you)',
-        r'(remember|recall|back to|going back)'
-    ]
+_REFERENCE_RE = re.compile(
+    r'you said|you mentioned|earlier|before|last time|we talked about'
+    r'|that thing|the thing|what you|as you|like you'
+    r'|remember|recall|back to|going back'
+)
+
 
-    for pattern in reference_patterns:
-        if re.search(pattern, message, re.IGNORECASE):
-            return True
-    return False
+def _check_references_previous(message_lower: str) -> bool:
+    """Check if the lowercased message references previous conversation."""
+    return _REFERENCE_RE.search(message_lower) is not None
 
 
 # ============================================================================
 # POST-PROCESSING
 # ============================================================================
 
+@dataclass(slots=True, frozen=True)
+class PostprocessResult:
+    """Result of post-processing an AI response."""
+    content: str
+    has_question: bool
+    action_items: list[str]
+    suggested_phase_transition: Optional[str]
+    quality_flags: list[str]
+
+
 def postprocess_ai_response(
     response: str,
     ring_phase: RingPhase,
     user_intent: str,
     user_sentiment: str
-) -> dict:
+) -> PostprocessResult:
     """
     Post-process AI response for quality and extraction.
 
-    Returns a dict with:
+    Returns a PostprocessResult with:
     - content: The (potentially cleaned) response text
     - has_question: Whether response ends with engagement
     - action_items: Any actionable items mentioned
@@ -438,9 +532,11 @@ def postprocess_ai_response(
     # Clean up any artifacts
     content = _clean_response(content)
 
+    content_lower = content.lower()
+
     # Check if response has engagement (question or call to action)
     has_question = bool(re.search(r'\?[\s]*$', content)) or bool(
-        re.search(r'(let me know|tell me|share|what do you think)', content.lower())
+        _ENGAGEMENT_RE.search(content_lower)
     )
 
     # Extract any action items
@@ -450,21 +546,27 @@ def postprocess_ai_response(
     suggested_phase_transition = _detect_phase_transition_signal(content, ring_phase)
 
     # Quality flags
-    quality_flags = _check_quality(content, user_intent, user_sentiment)
+    quality_flags = _check_quality(content, user_intent, user_sentiment, response_lower=content_lower)
+
+    return PostprocessResult(
+        content=content,
+        has_question=has_question,
+        action_items=action_items,
+        suggested_phase_transition=suggested_phase_transition,
+        quality_flags=quality_flags,
+    )
 
-    return {
-        "content": content,
-        "has_question": has_question,
-        "action_items": action_items,
-        "suggested_phase_transition": suggested_phase_transition,
-        "quality_flags": quality_flags,
-    }
+
+ENGAGEMENT_PHRASES = ('let me know', 'tell me', 'share', 'what do you think')
+_ENGAGEMENT_RE = re.compile('|'.join(ENGAGEMENT_PHRASES))
+
+_LEAK_RE = re.compile(r'^\s*(SYSTEM|ASSISTANT|AI):\s*', re.IGNORECASE)
 
 
 def _clean_response(response: str) -> str:
     """Clean up AI response artifacts."""
     # Remove any accidental system prompt leakage
-    response = re.sub(r'^\s*(SYSTEM|ASSISTANT|AI):\s*', '', response, flags=re.IGNORECASE)
+    response = _LEAK_RE.sub('', response)
 
     # Remove any markdown headers if they seem out of place
     if response.count('#') > 3:
@@ -477,80 +579,117 @@ def _clean_response(response: str) -> str:
     return response.strip()
 
 
+# Numbered list items, bullet points, or "Priority"/"Action"/"Step"/"Task" labels
+_ACTION_RE = re.compile(
+    r"^\s*(?:"
+    r"\d+[.\)]\s*(?P<num_body>.+)"
+    r"|[-•*]\s*(?P<bul_body>.+)"
+    r"|(?:Priority|Action|Step|Task)(?:\s*\d*)?:\s*(?P<lbl_body>.+?)"
+    r")$",
+    re.MULTILINE | re.IGNORECASE,
+)
+
+MAX_ACTION_ITEMS = 10
+
+
 def _extract_action_items(response: str) -> list[str]:
     """Extract actionable items from the response."""
-    action_items = []
+    action_items: list[str] = []
 
-    # Look for numbered lists
-    numbered_items = re.findall(r'^\s*\d+[\.\)]\s*(.+)$', response, re.MULTILINE)
-    action_items.extend(numbered_items)
+    for match in _ACTION_RE.finditer(response):
+        item = (match["num_body"] or match["bul_body"] or match["lbl_body"]).strip()
 
-    # Look for bullet points
-    bullet_items = re.findall(r'^\s*[-•*]\s*(.+)$', response, re.MULTILINE)
-    action_items.extend(bullet_items)
+        # Skip items that are too short or look like headers
+        if len(item) > 10 and not item.endswith(':'):
+            action_items.append(item)
+            if len(action_items) >= MAX_ACTION_ITEMS:
+                break
 
-    # Look for "Priority" or "Action" labeled items
-    priority_items = re.findall(
-        r'(?:Priority|Action|Step|Task)(?:\s*\d*)?:\s*(.+?)(?:\n|$)',
-        response,
-        re.IGNORECASE
-    )
-    action_items.extend(priority_items)
+    return action_items
 
-    # Filter out items that are too short or look like headers
-    action_items = [
-        item.strip() for item in action_items
-        if len(item.strip()) > 10 and not item.strip().endswith(':')
-    ]
 
-    return action_items[:10]  # Limit to 10 items
+def _trie_pattern(words) -> str:
+    """
+    Build a prefix-factored regex alternation for a set of literal words.
 
+    ["seo", "social"] becomes "s(?:eo|ocial)", so at each position the regex
+    engine only follows the branch for the current character instead of trying
+    every word in turn - the goto trie of Aho-Corasick, expressed as a regex.
+    When one word is a prefix of another, the longer match wins.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of word
+
+    def render(node: dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return render(trie)
+
+
+PHASE_TRANSITION_SIGNALS = {
+    RingPhase.CORE: [
+        "ready to discover", "discover some opportunities",
+        "good foundation", "understand your business",
+        "move forward", "next phase"
+    ],
+    RingPhase.DISCOVER: [
+        "build a plan", "create a strategy", "action plan",
+        "ready to plan", "let's prioritize"
+    ],
+    RingPhase.PLAN: [
+        "start executing", "take action", "let's do this",
+        "first step", "ready to implement"
+    ],
+    RingPhase.EXECUTE: [
+        "review progress", "step back", "optimize",
+        "what's working", "refine our approach"
+    ],
+    RingPhase.OPTIMIZE: [
+        "new cycle", "deeper dive", "revisit",
+        "next level", "evolved strategy"
+    ],
+}
 
-def _detect_phase_transition_signal(response: str, current_phase: RingPhase) -> Optional[str]:
-    """Detect if AI is signaling readiness to transition phases."""
-    response_lower = response.lower()
+PHASE_ORDER = [RingPhase.CORE, RingPhase.DISCOVER, RingPhase.PLAN,
+               RingPhase.EXECUTE, RingPhase.OPTIMIZE]
 
-    transition_signals = {
-        RingPhase.CORE: [
-            "ready to discover", "discover some opportunities",
-            "good foundation", "understand your business",
-            "move forward", "next phase"
-        ],
-        RingPhase.DISCOVER: [
-            "build a plan", "create a strategy", "action plan",
-            "ready to plan", "let's prioritize"
-        ],
-        RingPhase.PLAN: [
-            "start executing", "take action", "let's do this",
-            "first step", "ready to implement"
-        ],
-        RingPhase.EXECUTE: [
-            "review progress", "step back", "optimize",
-            "what's working", "refine our approach"
-        ],
-        RingPhase.OPTIMIZE: [
-            "new cycle", "deeper dive", "revisit",
-            "next level", "evolved strategy"
-        ],
-    }
+_NEXT_PHASE = dict(zip(PHASE_ORDER, PHASE_ORDER[1:]))
+
+_TRANSITION_RE = {
+    phase: re.compile(_trie_pattern(signals))
+    for phase, signals in PHASE_TRANSITION_SIGNALS.items()
+}
 
-    signals = transition_signals.get(current_phase, [])
-    for signal in signals:
-        if signal in response_lower:
-            # Map to next phase
-            phase_order = [RingPhase.CORE, RingPhase.DISCOVER, RingPhase.PLAN,
-                          RingPhase.EXECUTE, RingPhase.OPTIMIZE]
-            try:
-                current_idx = phase_order.index(current_phase)
-                if current_idx < len(phase_order) - 1:
-                    return phase_order[current_idx + 1].value
-            except ValueError:
-                pass
 
+def _detect_phase_transition_signal(response: str, current_phase: RingPhase) -> Optional[str]:
+    """Detect if AI is signaling readiness to transition phases."""
+    # The last phase has nowhere to go, so skip the scan entirely
+    next_phase = _NEXT_PHASE.get(current_phase)
+    if next_phase and _TRANSITION_RE[current_phase].search(response.lower()):
+        return next_phase.value
     return None
 
 
-def _check_quality(response: str, user_intent: str, user_sentiment: str) -> list[str]:
+# Phrases that show the response acknowledges a user's concern
+_ACK_RE = re.compile(r"understand|hear you|makes sense|valid|challenging|difficult")
+
+
+def _check_quality(
+    response: str,
+    user_intent: str,
+    user_sentiment: str,
+    response_lower: Optional[str] = None,
+) -> list[str]:
     """Check response quality and return any flags."""
     flags = []
 
@@ -561,14 +700,14 @@ def _check_quality(response: str, user_intent: str, user_sentiment: str) -> list
         flags.append("response_too_long")
 
     # Check if response addresses negative sentiment
-    if user_sentiment == "negative" and not any(
-        word in response.lower() for word in
-        ['understand', 'hear you', 'makes sense', 'valid', 'challenging', 'difficult']
-    ):
-        flags.append("may_not_acknowledge_concern")
+    if user_sentiment == "negative":
+        if response_lower is None:
+            response_lower = response.lower()
+        if not _ACK_RE.search(response_lower):
+            flags.append("may_not_acknowledge_concern")
 
     # Check if question was asked when one might be expected
-    if user_intent == "statement" and '?' not in response:
+    if user_intent == _STATEMENT and '?' not in response:
         flags.append("no_follow_up_question")
 
     return flags
@@ -578,6 +717,71 @@ def _check_quality(response: str, user_intent: str, user_sentiment: str) -> list
 # RING PHASE ADVANCEMENT
 # ============================================================================
 
+# Phase-specific advancement criteria
+PHASE_CRITERIA = {
+    RingPhase.CORE: {
+        "min_exchanges": 4,
+        "key_signals": [
+            "target audience", "ideal customer", "customers",
+            "different", "unique", "value", "problem we solve",
+            "mission", "vision", "goal"
+        ],
+        "sufficient_coverage": 3,  # Need to cover at least 3 key signals
+    },
+    RingPhase.DISCOVER: {
+        "min_exchanges": 3,
+        "key_signals": [
+            "competitor", "opportunity", "quick win", "improve",
+            "channel", "marketing", "seo", "social"
+        ],
+        "sufficient_coverage": 2,
+    },
+    RingPhase.PLAN: {
+        "min_exchanges": 3,
+        "key_signals": [
+            "priority", "action", "timeline", "first",
+            "metric", "measure", "goal"
+        ],
+        "sufficient_coverage": 2,
+    },
+    RingPhase.EXECUTE: {
+        "min_exchanges": 4,
+        "key_signals": [
+            "done", "completed", "finished", "working on",
+            "progress", "started", "implemented"
+        ],
+        "sufficient_coverage": 2,
+    },
+    RingPhase.OPTIMIZE: {
+        "min_exchanges": 3,
+        "key_signals": [
+            "results", "learning", "adjust", "improve",
+            "working", "not working", "next"
+        ],
+        "sufficient_coverage": 2,
+    },
+}
+
+# One trie scan per phase for all of its signals, independent of how many
+# signals there are. The capture sits in a lookahead so overlapping signals
+# still count ("working" inside "not working").
+_PHASE_SIGNAL_RE = {
+    phase: re.compile("(?=(" + _trie_pattern(criteria["key_signals"]) + "))")
+    for phase, criteria in PHASE_CRITERIA.items()
+}
+
+
+def _conversation_summary(conversation: Conversation) -> tuple[int, str]:
+    """Get the number of user messages and the lowercased text of all messages, in one pass."""
+    user_count = 0
+    parts = []
+    for m in conversation.messages:
+        if m.role == MessageRole.USER:
+            user_count += 1
+        parts.append(m.content.lower())
+    return user_count, " ".join(parts)
+
+
 async def analyze_for_phase_advancement(
     conversation: Conversation,
     latest_exchange: tuple[str, str],  # (user_message, ai_response)
@@ -593,58 +797,12 @@ async def analyze_for_phase_advancement(
     - reason: str
     """
     ring_phase = conversation.ring_phase
-    messages = conversation.messages
     user_message, ai_response = latest_exchange
 
     # Count exchanges (pairs of user + assistant messages)
-    exchange_count = len([m for m in messages if m.role == MessageRole.USER])
-
-    # Phase-specific criteria
-    criteria = {
-        RingPhase.CORE: {
-            "min_exchanges": 4,
-            "key_signals": [
-                "target audience", "ideal customer", "customers",
-                "different", "unique", "value", "problem we solve",
-                "mission", "vision", "goal"
-            ],
-            "sufficient_coverage": 3,  # Need to cover at least 3 key signals
-        },
-        RingPhase.DISCOVER: {
-            "min_exchanges": 3,
-            "key_signals": [
-                "competitor", "opportunity", "quick win", "improve",
-                "channel", "marketing", "seo", "social"
-            ],
-            "sufficient_coverage": 2,
-        },
-        RingPhase.PLAN: {
-            "min_exchanges": 3,
-            "key_signals": [
-                "priority", "action", "timeline", "first",
-                "metric", "measure", "goal"
-            ],
-            "sufficient_coverage": 2,
-        },
-        RingPhase.EXECUTE: {
-            "min_exchanges": 4,
-            "key_signals": [
-                "done", "completed", "finished", "working on",
-                "progress", "started", "implemented"
-            ],
-            "sufficient_coverage": 2,
-        },
-        RingPhase.OPTIMIZE: {
-            "min_exchanges": 3,
-            "key_signals": [
-                "results", "learning", "adjust", "improve",
-                "working", "not working", "next"
-            ],
-            "sufficient_coverage": 2,
-        },
-    }
+    exchange_count, conversation_text = _conversation_summary(conversation)
 
-    phase_criteria = criteria.get(ring_phase)
+    phase_criteria = PHASE_CRITERIA.get(ring_phase)
     if not phase_criteria:
         return {"should_advance": False, "confidence": 0, "reason": "Unknown phase"}
 
@@ -657,13 +815,9 @@ async def analyze_for_phase_advancement(
         }
 
     # Check topic coverage in conversation
-    all_content = " ".join([m.content.lower() for m in messages])
-    all_content += f" {user_message.lower()} {ai_response.lower()}"
+    all_content = f"{conversation_text} {user_message.lower()} {ai_response.lower()}"
 
-    covered_signals = sum(
-        1 for signal in phase_criteria["key_signals"]
-        if signal in all_content
-    )
+    covered_signals = len(set(_PHASE_SIGNAL_RE[ring_phase].findall(all_content)))
 
     if covered_signals >= phase_criteria["sufficient_coverage"]:
         confidence = min(0.9, 0.5 + (covered_signals / len(phase_criteria["key_signals"])) * 0.4)
@@ -692,15 +846,212 @@ async def analyze_for_phase_advancement(
 # RAG CONTEXT OPTIMIZATION
 # ============================================================================
 
+_INDENTED_JSON = json.JSONEncoder(indent=2)
+
+
+def _bounded_json(obj, limit: int) -> str:
+    """
+    Serialize obj as indented JSON, truncated to limit characters.
+
+    Same output as json.dumps(obj, indent=2)[:limit], but the encoder's chunks
+    are consumed lazily and serialization stops once enough text exists.
+    """
+    buf = io.StringIO()
+    for chunk in _INDENTED_JSON.iterencode(obj):
+        buf.write(chunk)
+        if buf.tell() >= limit:
+            break
+    return buf.getvalue()[:limit]
+
+
+class _SafeDict(dict):
+    """format_map() values that render missing keys as a default."""
+
+    __slots__ = ("default",)
+
+    def __init__(self, *args, default: str = "", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default = default
+
+    def __missing__(self, key: str) -> str:
+        return self.default
+
+
+_SECTION_TPL_BUSINESS = """
+BUSINESS WEBSITE: {url}
+Business Name: {title}
+Description: {desc}
+"""
+
+_SECTION_TPL_HEADINGS = """
+WEBSITE STRUCTURE (main headings):
+{items}
+"""
+
+_SECTION_TPL_KEY_PARAGRAPHS = """
+KEY CONTENT FROM WEBSITE:
+{items}"""
+
+_SECTION_TPL_SCORES = """
+WEBSITE ANALYSIS SCORES:
+Overall: {overall}/100
+- SEO: {seo}/100
+- Content: {content}/100
+- Mobile: {mobile}/100
+- Speed: {speed}/100
+- Social: {social}/100
+"""
+
+_SECTION_TPL_QUICK_WINS = """
+IDENTIFIED QUICK WINS:
+{items}
+"""
+
+_SECTION_TPL_CONTENT_ISSUES = """
+CONTENT ISSUES TO ADDRESS:
+{items}
+"""
+
+_SECTION_TPL_SEO_DETAILS = """
+SEO DETAILS:
+{details}
+"""
+
+
+def _build_business(analysis_context: dict) -> Optional[str]:
+    """Basic business context, included in every phase."""
+    website_desc = analysis_context.get('website_description', '')
+    return _SECTION_TPL_BUSINESS.format_map(_SafeDict(
+        url=analysis_context.get('website_url', 'Not provided'),
+        title=analysis_context.get('website_title', 'Unknown'),
+        desc=website_desc[:200] if website_desc else 'No description found',
+    ))
+
+
+def _build_headings(analysis_context: dict) -> Optional[str]:
+    """Website structure, for understanding the business."""
+    headings = analysis_context.get('website_headings')
+    if not headings:
+        return None
+    return _SECTION_TPL_HEADINGS.format_map(_SafeDict(
+        items="\n".join([f"- {h}" for h in islice(headings, 8)]),
+    ))
+
+
+def _build_key_paragraphs(analysis_context: dict) -> Optional[str]:
+    """Key website copy, for understanding the business."""
+    key_paragraphs = analysis_context.get('key_paragraphs')
+    if not key_paragraphs:
+        return None
+    return _SECTION_TPL_KEY_PARAGRAPHS.format_map(_SafeDict(
+        items="\n".join([
+            f"• {p[:250]}..." if len(p) > 250 else f"• {p}"
+            for p in islice(key_paragraphs, 4)
+        ]),
+    ))
+
+
+def _build_scores(analysis_context: dict) -> Optional[str]:
+    """Analysis scores; categories missing from the analysis render as N/A."""
+    overall_score = analysis_context.get('overall_score')
+    if not overall_score:
+        return None
+    scores = analysis_context.get('scores', {})
+    return _SECTION_TPL_SCORES.format_map(
+        _SafeDict(scores, overall=overall_score, default='N/A')
+    )
+
+
+def _build_quick_wins(analysis_context: dict) -> Optional[str]:
+    """Quick wins identified by the analysis."""
+    quick_wins = analysis_context.get('quick_wins')
+    if not quick_wins:
+        return None
+    return _SECTION_TPL_QUICK_WINS.format_map(_SafeDict(
+        items="\n".join([f"- {win}" for win in islice(quick_wins, 5)]),
+    ))
+
+
+def _build_content_issues(analysis_context: dict) -> Optional[str]:
+    """Content issues, for action planning."""
+    content_issues = analysis_context.get('content_analysis', {}).get('issues', [])
+    if not content_issues:
+        return None
+    return _SECTION_TPL_CONTENT_ISSUES.format_map(_SafeDict(
+        items="\n".join([f"- {issue}" for issue in islice(content_issues, 5)]),
+    ))
+
+
+def _build_seo_details(analysis_context: dict) -> Optional[str]:
+    """SEO details, for benchmarking."""
+    seo_analysis = analysis_context.get('seo_analysis', {})
+    if not seo_analysis:
+        return None
+    return _SECTION_TPL_SEO_DETAILS.format_map(_SafeDict(
+        details=_bounded_json(seo_analysis, limit=800),
+    ))
+
+
+# Sections to build for each phase, in prompt order
+_PHASE_BUILDERS: dict[RingPhase, tuple[Callable[[dict], Optional[str]], ...]] = {
+    RingPhase.CORE: (_build_business, _build_headings, _build_key_paragraphs),
+    RingPhase.DISCOVER: (
+        _build_business, _build_headings, _build_key_paragraphs,
+        _build_scores, _build_quick_wins,
+    ),
+    RingPhase.PLAN: (_build_business, _build_scores, _build_quick_wins, _build_content_issues),
+    RingPhase.EXECUTE: (_build_business, _build_scores, _build_quick_wins, _build_content_issues),
+    RingPhase.OPTIMIZE: (_build_business, _build_seo_details),
+}
+
+
+def _rag_sections(context: dict, ring_phase: RingPhase) -> tuple[str, ...]:
+    """Build the non-empty RAG sections for a phase."""
+    sections = (build(context) for build in _PHASE_BUILDERS[ring_phase])
+    return tuple(section for section in sections if section)
+
+
+class _ContextKey:
+    """Cache key for an analysis context: compares by analysis (id, completed_at)."""
+
+    __slots__ = ("version", "context")
+
+    def __init__(self, version: tuple, context: dict):
+        self.version = version
+        self.context = context
+
+    def __hash__(self) -> int:
+        return hash(self.version)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _ContextKey) and self.version == other.version
+
+
+@lru_cache(maxsize=128)
+def _build_rag_sections(
+    key: _ContextKey,
+    ring_phase: RingPhase,
+    recent_topics: tuple[str, ...],
+) -> tuple[str, ...]:
+    """Build the RAG sections for a phase (cached; the analysis rarely changes)."""
+    return _rag_sections(key.context, ring_phase)
+
+
 def build_optimized_rag_context(
     analysis_context: Optional[dict],
     ring_phase: RingPhase,
     recent_topics: list[str]
-) -> str:
+) -> list[dict]:
     """
     Build optimized RAG context based on ring phase and conversation topics.
 
-    Different phases need different context emphasis:
+    Returns one text content block per section so the caller can place the
+    context in its own cacheable block, separate from the static system prompt
+    and from per-turn notes. Contexts loaded by AIService carry their
+    analysis version, and their sections are cached per version, phase and
+    topics, since a completed analysis doesn't change.
+
+    Different phases need different context emphasis (see _PHASE_BUILDERS):
     - CORE: Website content for understanding the business
     - DISCOVER: Scores, quick wins, competitive data
     - PLAN: Quick wins prioritized, action-oriented data
@@ -708,80 +1059,126 @@ def build_optimized_rag_context(
     - OPTIMIZE: Metrics, benchmarks
     """
     if not analysis_context:
-        return ""
+        return []
 
-    sections = []
+    version = analysis_context.get("analysis_version")
+    if version is None:
+        sections = _rag_sections(analysis_context, ring_phase)
+    else:
+        sections = _build_rag_sections(
+            _ContextKey(version, analysis_context), ring_phase, tuple(recent_topics)
+        )
+    return [{"type": "text", "text": section} for section in sections]
 
-    # Always include basic business context
-    website_url = analysis_context.get('website_url', 'Not provided')
-    website_title = analysis_context.get('website_title', 'Unknown')
-    website_desc = analysis_context.get('website_description', '')
+# ============================================================================
+# RESPONSE CACHE
+# ============================================================================
 
-    sections.append(f"""
-BUSINESS WEBSITE: {website_url}
-Business Name: {website_title}
-Description: {website_desc[:200] if website_desc else 'No description found'}
-""")
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
 
-    # Phase-specific context
-    if ring_phase in [RingPhase.CORE, RingPhase.DISCOVER]:
-        # Include website content for understanding
-        headings = analysis_context.get('website_headings', [])[:8]
-        key_paragraphs = analysis_context.get('key_paragraphs', [])[:4]
 
-        if headings:
-            sections.append(f"""
-WEBSITE STRUCTURE (main headings):
-{chr(10).join(f"- {h}" for h in headings)}
-""")
+def _normalize_message(message: str) -> str:
+    """Normalize a user message so trivially different re-asks compare equal."""
+    return " ".join(_NON_WORD_RE.sub(" ", message.lower()).split())
 
-        if key_paragraphs:
-            sections.append("""
-KEY CONTENT FROM WEBSITE:
-""" + chr(10).join(f"• {p[:250]}..." if len(p) > 250 else f"• {p}" for p in key_paragraphs))
 
-    if ring_phase in [RingPhase.DISCOVER, RingPhase.PLAN, RingPhase.EXECUTE]:
-        # Include scores and quick wins
-        overall_score = analysis_context.get('overall_score')
-        scores = analysis_context.get('scores', {})
-        quick_wins = analysis_context.get('quick_wins', [])
+class ResponseCache:
+    """
+    In-process LRU cache of LLM responses with a time-to-live.
 
-        if overall_score:
-            sections.append(f"""
-WEBSITE ANALYSIS SCORES:
-Overall: {overall_score}/100
-- SEO: {scores.get('seo', 'N/A')}/100
-- Content: {scores.get('content', 'N/A')}/100
-- Mobile: {scores.get('mobile', 'N/A')}/100
-- Speed: {scores.get('speed', 'N/A')}/100
-- Social: {scores.get('social', 'N/A')}/100
-""")
-
-        if quick_wins:
-            sections.append(f"""
-IDENTIFIED QUICK WINS:
-{json.dumps(quick_wins[:5], indent=2)}
-""")
-
-    if ring_phase in [RingPhase.PLAN, RingPhase.EXECUTE]:
-        # Include content issues for action planning
-        content_issues = analysis_context.get('content_analysis', {}).get('issues', [])
-        if content_issues:
-            sections.append(f"""
-CONTENT ISSUES TO ADDRESS:
-{chr(10).join(f"- {issue}" for issue in content_issues[:5])}
-""")
-
-    if ring_phase == RingPhase.OPTIMIZE:
-        # Include all scores for benchmarking
-        seo_analysis = analysis_context.get('seo_analysis', {})
-        if seo_analysis:
-            sections.append(f"""
-SEO DETAILS:
-{json.dumps(seo_analysis, indent=2)[:800]}
-""")
+    Keys cover everything sent to the model, so a hit is only possible for the
+    same prompt, context and history with an equivalent user message - e.g.
+    the same opening question in fresh conversations, or a resubmitted turn.
+    """
 
-    return chr(10).join(sections)
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+
+    @staticmethod
+    def key(model: str, user_id: UUID, messages: list[dict], user_message: str) -> bytes:
+        """Build the cache key for a request (the last message is the user's)."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{model}\0{user_id}\0{_normalize_message(user_message)}\0".encode())
+        digest.update(json.dumps(messages[:-1], sort_keys=True, default=str).encode())
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Return the cached response, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def set(self, key: bytes, response: str) -> None:
+        """Cache a response, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        self._entries.clear()
+
+
+_response_cache = ResponseCache(
+    maxsize=settings.RESPONSE_CACHE_SIZE,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+
+# ============================================================================
+# ANALYSIS CONTEXT CACHE
+# ============================================================================
+
+ANALYSIS_CONTEXT_CACHE_SIZE = 1024
+
+# user_id -> (checked_at, (analysis id, completed_at) or None, analysis context)
+_analysis_contexts: OrderedDict[UUID, tuple[float, Optional[tuple], Optional[dict]]] = OrderedDict()
+
+
+def invalidate_analysis_context(user_id: UUID) -> None:
+    """Drop a user's cached analysis context, e.g. when a new analysis completes."""
+    _analysis_contexts.pop(user_id, None)
+
+
+# Only the parts of Analysis.results that RAG context uses are loaded; the raw
+# page text and competitor list stay in the database
+_ANALYSIS_CONTEXT_COLUMNS = (
+    Analysis.website_url,
+    Analysis.results["overall_score"].label("overall_score"),
+    Analysis.results["scores"].label("scores"),
+    Analysis.results["quick_wins"].label("quick_wins"),
+    Analysis.results["content_analysis"].label("content_analysis"),
+    Analysis.results["seo_analysis"].label("seo_analysis"),
+    Analysis.results[("website_content", "title")].label("website_title"),
+    Analysis.results[("website_content", "description")].label("website_description"),
+    Analysis.results[("website_content", "headings")].label("website_headings"),
+    Analysis.results[("website_content", "key_paragraphs")].label("key_paragraphs"),
+)
+
+
+def _build_analysis_context(row, version: tuple) -> dict:
+    """
+    Build the context used for RAG from an _ANALYSIS_CONTEXT_COLUMNS row.
+
+    version is the analysis' (id, completed_at), which keys the RAG section cache.
+    """
+    context = row._asdict()
+    context["analysis_version"] = version
+    for key in ("website_headings", "key_paragraphs"):
+        if context[key] is None:
+            context[key] = []
+    return context
 
 
 # ============================================================================
@@ -802,19 +1199,24 @@ class AIService:
     def __init__(self, db: AsyncSession):
         self.db = db
         self.model = settings.AI_MODEL
+        # Post-processing of the last response from generate_response_stream
+        self.stream_postprocessing: Optional[PostprocessResult] = None
 
     async def generate_response(
         self,
         conversation: Conversation,
         user_message: str,
         user_id: UUID,
+        user_message_id: Optional[UUID] = None,
     ) -> str:
         """Generate an AI response with full context engineering pipeline."""
 
+        history = await self._recent_messages(conversation.id, exclude_id=user_message_id)
+
         # 1. PRE-PROCESSING
         preprocessing = preprocess_user_message(
             message=user_message,
-            conversation_history=list(conversation.messages),
+            conversation_history=history,
             ring_phase=conversation.ring_phase,
         )
 
@@ -831,44 +1233,53 @@ class AIService:
         # 4. BUILD MESSAGES
         messages = self._build_messages(
             conversation=conversation,
+            history=history,
             user_message=user_message,
             preprocessing=preprocessing,
             rag_context=rag_context,
         )
 
-        # 5. CALL LLM
-        try:
-            response = await acompletion(
-                model=self.model,
-                messages=messages,
-                max_tokens=600,
-                temperature=0.7,
-            )
-            raw_response = response.choices[0].message.content
-        except Exception as e:
-            return self._get_fallback_response(conversation.ring_phase, str(e))
+        # 5. CALL LLM (unless an equivalent request was answered recently)
+        cache_key = ResponseCache.key(self.model, user_id, messages, user_message)
+        raw_response = _response_cache.get(cache_key)
+        if raw_response is None:
+            try:
+                response = await acompletion(
+                    model=self.model,
+                    messages=messages,
+                    max_tokens=600,
+                    temperature=0.7,
+                )
+                raw_response = response.choices[0].message.content
+            except Exception as e:
+                return self._get_fallback_response(conversation.ring_phase, str(e))
+            if raw_response:
+                _response_cache.set(cache_key, raw_response)
 
         # 6. POST-PROCESSING
         postprocessing = postprocess_ai_response(
             response=raw_response,
             ring_phase=conversation.ring_phase,
-            user_intent=preprocessing["intent"],
-            user_sentiment=preprocessing["sentiment"],
+            user_intent=preprocessing.intent,
+            user_sentiment=preprocessing.sentiment,
         )
 
-        return postprocessing["content"]
+        return postprocessing.content
 
     async def generate_response_stream(
         self,
         conversation: Conversation,
         user_message: str,
         user_id: UUID,
+        user_message_id: Optional[UUID] = None,
     ) -> AsyncGenerator[str, None]:
         """Generate a streaming AI response."""
 
+        history = await self._recent_messages(conversation.id, exclude_id=user_message_id)
+
         preprocessing = preprocess_user_message(
             message=user_message,
-            conversation_history=list(conversation.messages),
+            conversation_history=history,
             ring_phase=conversation.ring_phase,
         )
 
@@ -882,6 +1293,7 @@ class AIService:
 
         messages = self._build_messages(
             conversation=conversation,
+            history=history,
             user_message=user_message,
             preprocessing=preprocessing,
             rag_context=rag_context,
@@ -896,16 +1308,59 @@ class AIService:
                 stream=True,
             )
 
+            # Coalesce small deltas so downstream framing and writes happen
+            # per batch rather than per token
+            min_chars = settings.STREAM_COALESCE_CHARS
+            max_delay = settings.STREAM_COALESCE_SECONDS
+            chunks: list[str] = []
+            buffer: list[str] = []
+            buffered = 0
+            last_flush = time.monotonic()
             async for chunk in response:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+                content = chunk.choices[0].delta.content
+                if not content:
+                    continue
+                buffer.append(content)
+                buffered += len(content)
+                now = time.monotonic()
+                if buffered >= min_chars or now - last_flush > max_delay:
+                    text = "".join(buffer)
+                    buffer.clear()
+                    buffered = 0
+                    last_flush = now
+                    chunks.append(text)
+                    yield text
+            if buffer:
+                text = "".join(buffer)
+                chunks.append(text)
+                yield text
+            # Nothing reads the post-processing before the stream ends, so one
+            # pass over the full text suffices
+            self.stream_postprocessing = postprocess_ai_response(
+                response="".join(chunks),
+                ring_phase=conversation.ring_phase,
+                user_intent=preprocessing.intent,
+                user_sentiment=preprocessing.sentiment,
+            )
         except Exception as e:
             yield self._get_fallback_response(conversation.ring_phase, str(e))
 
     async def _get_analysis_context(self, user_id: UUID) -> Optional[dict]:
-        """Get the most recent completed analysis for the user."""
+        """
+        Get the context of the most recent completed analysis for the user.
+
+        Contexts are cached per user. Once the cache entry is older than
+        ANALYSIS_CONTEXT_CACHE_TTL_SECONDS, a cheap query checks which analysis
+        is latest and the needed results fields are only reloaded if that has
+        changed.
+        """
+        now = time.monotonic()
+        cached = _analysis_contexts.get(user_id)
+        if cached and now - cached[0] < settings.ANALYSIS_CONTEXT_CACHE_TTL_SECONDS:
+            return cached[2]
+
         result = await self.db.execute(
-            select(Analysis)
+            select(Analysis.id, Analysis.completed_at)
             .where(
                 Analysis.user_id == user_id,
                 Analysis.status == AnalysisStatus.COMPLETED,
@@ -913,77 +1368,116 @@ class AIService:
             .order_by(Analysis.completed_at.desc())
             .limit(1)
         )
-        analysis = result.scalar_one_or_none()
-
-        if analysis and analysis.results:
-            website_content = analysis.results.get("website_content", {})
-
-            return {
-                "website_url": analysis.website_url,
-                "overall_score": analysis.results.get("overall_score"),
-                "scores": analysis.results.get("scores"),
-                "quick_wins": analysis.results.get("quick_wins"),
-                "content_analysis": analysis.results.get("content_analysis"),
-                "seo_analysis": analysis.results.get("seo_analysis"),
-                "competitors": analysis.results.get("competitors"),
-                "website_title": website_content.get("title"),
-                "website_description": website_content.get("description"),
-                "website_headings": website_content.get("headings", []),
-                "website_content": website_content.get("raw_content", ""),
-                "key_paragraphs": website_content.get("key_paragraphs", []),
-            }
-        return None
+        latest = result.first()
+        version = tuple(latest) if latest else None
+
+        if cached and cached[1] == version:
+            analysis_context = cached[2]
+        elif latest is None:
+            analysis_context = None
+        else:
+            result = await self.db.execute(
+                select(*_ANALYSIS_CONTEXT_COLUMNS).where(Analysis.id == latest.id)
+            )
+            analysis_context = _build_analysis_context(result.one(), version)
+
+        _analysis_contexts[user_id] = (now, version, analysis_context)
+        _analysis_contexts.move_to_end(user_id)
+        while len(_analysis_contexts) > ANALYSIS_CONTEXT_CACHE_SIZE:
+            _analysis_contexts.popitem(last=False)
+
+        return analysis_context
+
+    async def _recent_messages(
+        self, conversation_id: UUID, n: int = 10, exclude_id: Optional[UUID] = None
+    ) -> list[Message]:
+        """
+        Get the last n messages of a conversation, oldest first.
+
+        exclude_id leaves out the already-saved message of the current turn,
+        which _build_messages appends as the new user message itself.
+        """
+        query = select(Message).where(Message.conversation_id == conversation_id)
+        if exclude_id is not None:
+            query = query.where(Message.id != exclude_id)
+        result = await self.db.execute(
+            query.order_by(Message.created_at.desc()).limit(n)
+        )
+        return list(reversed(result.scalars().all()))
 
     def _build_messages(
         self,
         conversation: Conversation,
+        history: list[Message],
         user_message: str,
-        preprocessing: dict,
-        rag_context: str,
+        preprocessing: PreprocessResult,
+        rag_context: list[dict],
     ) -> list[dict]:
-        """Build the message list for the LLM with enhanced context."""
+        """
+        Build the message list for the LLM with enhanced context.
+
+        Layout is static phase prompt, conversation history, per-turn context,
+        then the new user message, so the prompt and history form a prefix that
+        prompt caching can reuse from one turn to the next.
+        """
         messages = []
 
-        # System prompt based on ring phase
-        system_content = SYSTEM_PROMPTS.get(
-            conversation.ring_phase,
-            SYSTEM_PROMPTS[RingPhase.CORE]
-        )
+        # Static system prompt based on ring phase (copied so providers can't
+        # mutate the shared blocks)
+        system_blocks = [
+            dict(block) for block in SYSTEM_PROMPT_BLOCKS.get(
+                conversation.ring_phase,
+                SYSTEM_PROMPT_BLOCKS[RingPhase.CORE]
+            )
+        ]
+        messages.append({"role": "system", "content": system_blocks})
+
+        # Add conversation history (recent messages, oldest first)
+        for msg in history:
+            role = "user" if msg.role == MessageRole.USER else "assistant"
+            messages.append({"role": role, "content": msg.content})
+
+        # Mark the end of the history as a cache breakpoint too
+        if history:
+            messages[-1]["content"] = [{
+                "type": "text",
+                "text": messages[-1]["content"],
+                "cache_control": {"type": "ephemeral"},
+            }]
+
+        # Dynamic context goes after the cached prefix
+        context_blocks = []
 
         # Add RAG context
         if rag_context:
-            system_content += f"""
+            # build_optimized_rag_context already returns fresh blocks
+            context_blocks.append({"type": "text", "text": RAG_CONTEXT_INTRO})
+            context_blocks.extend(rag_context)
+            context_blocks.append({"type": "text", "text": RAG_CONTEXT_OUTRO})
 
----
-CONTEXT FROM WEBSITE ANALYSIS:
-{rag_context}
----
-Use this context to personalize your responses. Reference specific details from their website when relevant.
-"""
+        context_content = ""
 
         # Add business context if stored in conversation
         if conversation.business_context:
-            system_content += f"""
+            context_content += f"""
 
 BUSINESS CONTEXT (from user input):
 {conversation.business_context}
 """
 
         # Add preprocessing enrichment notes
-        if preprocessing.get("enrichment_notes"):
-            system_content += f"""
-
-CONVERSATION NOTES:
-{chr(10).join(f"- {note}" for note in preprocessing['enrichment_notes'])}
-"""
+        if preprocessing.enrichment_notes:
+            context_content += "".join((
+                "\n\nCONVERSATION NOTES:\n",
+                "\n".join([f"- {note}" for note in preprocessing.enrichment_notes]),
+                "\n",
+            ))
 
-        messages.append({"role": "system", "content": system_content})
+        if context_content:
+            context_blocks.append({"type": "text", "text": context_content})
 
-        # Add conversation history (last 10 messages)
-        history_messages = sorted(conversation.messages, key=lambda m: m.created_at)[-10:]
-        for msg in history_messages:
-            role = "user" if msg.role == MessageRole.USER else "assistant"
-            messages.append({"role": role, "content": msg.content})
+        if context_blocks:
+            messages.append({"role": "system", "content": context_blocks})
 
         # Add the new user message
         messages.append({"role": "user", "content": user_message})
@@ -1017,6 +1511,6 @@ CONVERSATION NOTES:
         return fallbacks.get(ring_phase, "How can I help you today?")
 
 
-async def get_ai_service(db: AsyncSession) -> AIService:
+def get_ai_service(db: AsyncSession) -> AIService:
     """Dependency to get AI service."""
     return AIService(db)
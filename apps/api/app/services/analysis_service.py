@@ -9,11 +9,13 @@ from datetime import datetime
 from typing import Optional
 from uuid import UUID
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import httpx
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin, quote_plus
 
-from sqlalchemy import select
+from sqlalchemy import Row, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.analysis import Analysis, AnalysisStatus
@@ -29,11 +31,70 @@ from app.schemas.analysis import (
     AnalysisResultsResponse,
 )
 from app.core.exceptions import NotFoundError, ValidationError
+from app.services.ai_service import invalidate_analysis_context
+from app.services.website_parser import parse_website
 
 # Google PageSpeed Insights API (free tier: 25,000 requests/day)
 PAGESPEED_API_URL = "https://www.googleapis.com/pagespeedonline/v5/runPagespeed"
 PAGESPEED_API_KEY = os.getenv("GOOGLE_PAGESPEED_API_KEY", "")
 
+# Fetched pages are truncated to this many bytes before parsing
+MAX_PAGE_BYTES = 5_000_000
+
+# Progress of analyses running in this process. Only the start and the final
+# state are written to the database, so status checks read intermediate
+# progress from here and fall back to the stored value.
+_analysis_progress: dict[UUID, int] = {}
+
+# Shared client so outbound fetches reuse pooled connections across analyses;
+# created on first use and closed on app shutdown
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client for fetching websites and external APIs."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=30.0,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            headers={
+                "User-Agent": "Mozilla/5.0 (compatible; QuentoBot/1.0; +https://quento.co)"
+            },
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Worker processes for HTML parsing, so it doesn't compete with request
+# handling for the GIL; created on first use and shut down with the app.
+# Spawned workers only import the lightweight website_parser module.
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Get the process pool used for parsing fetched websites."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    """Shut down the parsing process pool."""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
 
 class AnalysisService:
     """Service for website analysis and scraping."""
@@ -50,19 +111,22 @@ class AnalysisService:
         if not parsed.scheme or not parsed.netloc:
             raise ValidationError("Invalid website URL")
 
-        # Create analysis record
-        analysis = Analysis(
-            user_id=user_id,
-            website_url=data.website_url,
-            status=AnalysisStatus.PENDING,
-            progress=0,
-            include_competitors=data.include_competitors,
-            include_social=data.include_social,
+        # Create analysis record; RETURNING gives back the full row, so no
+        # refresh round-trip is needed
+        result = await self.db.execute(
+            insert(Analysis)
+            .values(
+                user_id=user_id,
+                website_url=data.website_url,
+                status=AnalysisStatus.PENDING,
+                progress=0,
+                include_competitors=data.include_competitors,
+                include_social=data.include_social,
+            )
+            .returning(Analysis)
         )
-
-        self.db.add(analysis)
+        analysis = result.scalar_one()
         await self.db.commit()
-        await self.db.refresh(analysis)
 
         # Start analysis in background
         asyncio.create_task(self._run_analysis(analysis.id))
@@ -88,7 +152,19 @@ class AnalysisService:
         self, analysis_id: UUID, user_id: UUID
     ) -> AnalysisStatusResponse:
         """Get analysis status."""
-        analysis = await self.get_analysis(analysis_id, user_id)
+        # Polled while an analysis runs, so skip loading the results JSON
+        result = await self.db.execute(
+            select(Analysis.id, Analysis.status, Analysis.progress).where(
+                Analysis.id == analysis_id,
+                Analysis.user_id == user_id,
+            )
+        )
+        analysis = result.first()
+
+        if not analysis:
+            raise NotFoundError(f"Analysis {analysis_id} not found")
+
+        progress = self._current_progress(analysis)
 
         steps = [
             "Fetching website",
@@ -109,12 +185,12 @@ class AnalysisService:
         }
 
         current_step_idx = progress_to_step.get(
-            (analysis.progress // 20) * 20, 0
+            (progress // 20) * 20, 0
         )
 
         return AnalysisStatusResponse(
             status=analysis.status,
-            progress=analysis.progress,
+            progress=progress,
             current_step=steps[min(current_step_idx, len(steps) - 1)],
             steps_completed=steps[:current_step_idx],
             steps_remaining=steps[current_step_idx + 1:],
@@ -134,7 +210,7 @@ class AnalysisService:
             id=analysis.id,
             website_url=analysis.website_url,
             status=analysis.status,
-            progress=analysis.progress,
+            progress=self._current_progress(analysis),
             results=results,
             created_at=analysis.created_at,
             completed_at=analysis.completed_at,
@@ -142,16 +218,28 @@ class AnalysisService:
 
     async def list_analyses(
         self, user_id: UUID, limit: int = 20, offset: int = 0
-    ) -> list[Analysis]:
-        """List user's analyses."""
+    ) -> list[Row]:
+        """List user's analyses (summary columns only, without results)."""
         result = await self.db.execute(
-            select(Analysis)
+            select(
+                Analysis.id,
+                Analysis.website_url,
+                Analysis.status,
+                Analysis.progress,
+                Analysis.created_at,
+            )
             .where(Analysis.user_id == user_id)
             .order_by(Analysis.created_at.desc())
             .limit(limit)
             .offset(offset)
         )
-        return list(result.scalars().all())
+        return list(result.all())
+
+    def _current_progress(self, analysis: Analysis | Row) -> int:
+        """Get an analysis' progress, including unsaved progress of a running one."""
+        if analysis.status == AnalysisStatus.PROCESSING:
+            return _analysis_progress.get(analysis.id, analysis.progress)
+        return analysis.progress
 
     async def _run_analysis(self, analysis_id: UUID) -> None:
         """Run the actual analysis (background task)."""
@@ -159,47 +247,69 @@ class AnalysisService:
 
         async with async_session_maker() as db:
             try:
-                # Get analysis
+                # Update status to processing, getting back what the run needs
                 result = await db.execute(
-                    select(Analysis).where(Analysis.id == analysis_id)
+                    update(Analysis)
+                    .where(Analysis.id == analysis_id)
+                    .values(status=AnalysisStatus.PROCESSING, progress=10)
+                    .returning(
+                        Analysis.user_id,
+                        Analysis.website_url,
+                        Analysis.include_competitors,
+                        Analysis.include_social,
+                    )
                 )
-                analysis = result.scalar_one_or_none()
+                analysis = result.first()
+                await db.commit()
                 if not analysis:
                     return
 
-                # Update status to processing
-                analysis.status = AnalysisStatus.PROCESSING
-                analysis.progress = 10
-                await db.commit()
+                # Fetch website, conditionally if this page was analyzed before
+                previous = await self._get_previous_results(
+                    db, analysis.user_id, analysis.website_url
+                )
+                website_data = await self._fetch_website(
+                    analysis.website_url,
+                    validators=previous["website_content"] if previous else None,
+                )
+                _analysis_progress[analysis_id] = 20
 
-                # Fetch website
-                website_data = await self._fetch_website(analysis.website_url)
-                analysis.progress = 20
-                await db.commit()
+                # The analyzers are independent, quick passes over the fetched
+                # data, so they run back to back with no progress writes between
 
-                # Analyze content
-                content_analysis = self._analyze_content(website_data)
-                analysis.progress = 40
-                await db.commit()
+                if website_data is None:
+                    # Page unchanged since the previous analysis: reuse its
+                    # page-derived results
+                    content_analysis = previous["content_analysis"]
+                    seo_analysis = previous["seo_analysis"]
+                    website_content = previous["website_content"]
+                else:
+                    # Analyze content
+                    content_analysis = self._analyze_content(website_data)
 
-                # SEO analysis
-                seo_analysis = self._analyze_seo(website_data)
-                analysis.progress = 60
-                await db.commit()
+                    # SEO analysis
+                    seo_analysis = self._analyze_seo(website_data)
+
+                    website_content = {
+                        "title": website_data.get("title"),
+                        "description": website_data.get("meta_description"),
+                        "headings": website_data.get("h1_tags", []) + website_data.get("h2_tags", []),
+                        "raw_content": website_data.get("raw_content", ""),
+                        "key_paragraphs": website_data.get("key_paragraphs", []),
+                        # Validators for conditional re-fetches
+                        "etag": website_data.get("etag"),
+                        "last_modified": website_data.get("last_modified"),
+                    }
 
                 # Competitor analysis (placeholder)
                 competitors = []
                 if analysis.include_competitors:
                     competitors = self._analyze_competitors(website_data)
-                analysis.progress = 80
-                await db.commit()
 
                 # Social presence (placeholder)
                 social_presence = None
                 if analysis.include_social:
                     social_presence = self._analyze_social(website_data)
-                analysis.progress = 90
-                await db.commit()
 
                 # Calculate scores
                 scores = self._calculate_scores(
@@ -210,16 +320,10 @@ class AnalysisService:
                 quick_wins = self._generate_quick_wins(seo_analysis)
 
                 # Overall score
-                overall_score = sum([
-                    scores["seo"],
-                    scores["content"],
-                    scores["mobile"],
-                    scores["speed"],
-                    scores["social"],
-                ]) // 5
+                overall_score = self._overall_score(scores)
 
                 # Save results with RAG context
-                analysis.results = {
+                results = {
                     "overall_score": overall_score,
                     "scores": scores,
                     "content_analysis": content_analysis,
@@ -228,109 +332,90 @@ class AnalysisService:
                     "social_presence": social_presence,
                     "quick_wins": quick_wins,
                     # RAG context for AI conversations
-                    "website_content": {
-                        "title": website_data.get("title"),
-                        "description": website_data.get("meta_description"),
-                        "headings": website_data.get("h1_tags", []) + website_data.get("h2_tags", []),
-                        "raw_content": website_data.get("raw_content", ""),
-                        "key_paragraphs": website_data.get("key_paragraphs", []),
-                    },
+                    "website_content": website_content,
                 }
-                analysis.status = AnalysisStatus.COMPLETED
-                analysis.progress = 100
-                analysis.completed_at = datetime.utcnow()
+                await db.execute(
+                    update(Analysis)
+                    .where(Analysis.id == analysis_id)
+                    .values(
+                        results=results,
+                        status=AnalysisStatus.COMPLETED,
+                        progress=100,
+                        completed_at=datetime.utcnow(),
+                    )
+                )
                 await db.commit()
+                invalidate_analysis_context(analysis.user_id)
 
             except Exception as e:
-                # Handle errors
-                result = await db.execute(
-                    select(Analysis).where(Analysis.id == analysis_id)
+                # Handle errors: discard any half-done work and mark the
+                # analysis failed in a single UPDATE, without reloading it
+                await db.rollback()
+                await db.execute(
+                    update(Analysis)
+                    .where(Analysis.id == analysis_id)
+                    .values(status=AnalysisStatus.FAILED, error_message=str(e))
                 )
-                analysis = result.scalar_one_or_none()
-                if analysis:
-                    analysis.status = AnalysisStatus.FAILED
-                    analysis.error_message = str(e)
-                    await db.commit()
-
-    async def _fetch_website(self, url: str) -> dict:
-        """Fetch and parse website content."""
-        async with httpx.AsyncClient(
-            timeout=30.0,
-            follow_redirects=True,
-            headers={
-                "User-Agent": "Mozilla/5.0 (compatible; QuentoBot/1.0; +https://quento.co)"
-            },
-        ) as client:
-            response = await client.get(url)
+                await db.commit()
+            finally:
+                _analysis_progress.pop(analysis_id, None)
+
+    async def _get_previous_results(
+        self, db: AsyncSession, user_id: UUID, website_url: str
+    ) -> Optional[dict]:
+        """Get the results of the user's latest completed analysis of a page."""
+        result = await db.execute(
+            select(Analysis.results)
+            .where(
+                Analysis.user_id == user_id,
+                Analysis.status == AnalysisStatus.COMPLETED,
+                Analysis.website_url == website_url,
+            )
+            .order_by(Analysis.completed_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def _fetch_website(
+        self, url: str, validators: Optional[dict] = None
+    ) -> Optional[dict]:
+        """
+        Fetch and parse website content.
+
+        validators holds the etag/last_modified of an earlier fetch of the page;
+        returns None if the server reports the page unchanged since then.
+        """
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        # httpx already negotiates and decodes gzip/deflate responses
+        async with get_http_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return None
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            # Extract main content text for RAG context
-            # Remove script and style elements
-            for element in soup(["script", "style", "nav", "footer", "header"]):
-                element.decompose()
-
-            # Get clean text content
-            raw_text = soup.get_text(separator="\n", strip=True)
-            # Limit to ~8000 chars for context window efficiency
-            raw_content = raw_text[:8000] if len(raw_text) > 8000 else raw_text
-
-            # Extract key paragraphs (first 10 substantive ones)
-            paragraphs = []
-            for p in soup.find_all("p"):
-                text = p.get_text(strip=True)
-                if len(text) > 50:  # Only meaningful paragraphs
-                    paragraphs.append(text)
-                if len(paragraphs) >= 10:
+            # Read at most MAX_PAGE_BYTES of the body
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= MAX_PAGE_BYTES:
                     break
 
-            return {
-                "url": str(response.url),
-                "status_code": response.status_code,
-                "title": soup.title.string if soup.title else None,
-                "meta_description": self._get_meta(soup, "description"),
-                "meta_keywords": self._get_meta(soup, "keywords"),
-                "h1_tags": [h1.get_text(strip=True) for h1 in soup.find_all("h1")],
-                "h2_tags": [h2.get_text(strip=True) for h2 in soup.find_all("h2")],
-                "images": len(soup.find_all("img")),
-                "images_with_alt": len(soup.find_all("img", alt=True)),
-                "links": len(soup.find_all("a", href=True)),
-                "internal_links": self._count_internal_links(soup, url),
-                "external_links": self._count_external_links(soup, url),
-                "has_viewport": bool(soup.find("meta", {"name": "viewport"})),
-                "has_canonical": bool(soup.find("link", {"rel": "canonical"})),
-                "word_count": len(soup.get_text().split()),
-                "html_size": len(response.text),
-                # RAG context fields
-                "raw_content": raw_content,
-                "key_paragraphs": paragraphs,
-            }
+        html = b"".join(chunks)[:MAX_PAGE_BYTES].decode(response.encoding, errors="replace")
 
-    def _get_meta(self, soup: BeautifulSoup, name: str) -> Optional[str]:
-        """Get meta tag content."""
-        tag = soup.find("meta", {"name": name}) or soup.find("meta", {"property": f"og:{name}"})
-        return tag.get("content") if tag else None
-
-    def _count_internal_links(self, soup: BeautifulSoup, url: str) -> int:
-        """Count internal links."""
-        parsed = urlparse(url)
-        count = 0
-        for a in soup.find_all("a", href=True):
-            href = a.get("href", "")
-            if href.startswith("/") or parsed.netloc in href:
-                count += 1
-        return count
-
-    def _count_external_links(self, soup: BeautifulSoup, url: str) -> int:
-        """Count external links."""
-        parsed = urlparse(url)
-        count = 0
-        for a in soup.find_all("a", href=True):
-            href = a.get("href", "")
-            if href.startswith("http") and parsed.netloc not in href:
-                count += 1
-        return count
+        # Parsing is CPU-bound, so keep it off the event loop
+        website_data = await asyncio.get_running_loop().run_in_executor(
+            get_parse_pool(), parse_website, html, url, str(response.url), response.status_code
+        )
+        website_data["etag"] = response.headers.get("etag")
+        website_data["last_modified"] = response.headers.get("last-modified")
+        return website_data
 
     def _analyze_content(self, data: dict) -> dict:
         """Analyze website content."""
@@ -501,6 +586,16 @@ class AnalysisService:
             "social": social_score,
         }
 
+    def _overall_score(self, scores: dict) -> int:
+        """Average of the category scores."""
+        return sum([
+            scores["seo"],
+            scores["content"],
+            scores["mobile"],
+            scores["speed"],
+            scores["social"],
+        ]) // 5
+
     def _generate_quick_wins(self, seo: dict) -> list[str]:
         """Generate quick win recommendations."""
         quick_wins = []
@@ -534,14 +629,15 @@ class AnalysisService:
             if PAGESPEED_API_KEY:
                 params["key"] = PAGESPEED_API_KEY
 
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.get(PAGESPEED_API_URL, params=params)
+            response = await get_http_client().get(
+                PAGESPEED_API_URL, params=params, timeout=60.0
+            )
 
-                if response.status_code != 200:
-                    # Return fallback scores if API fails
-                    return self._get_fallback_pagespeed()
+            if response.status_code != 200:
+                # Return fallback scores if API fails
+                return self._get_fallback_pagespeed()
 
-                data = response.json()
+            data = response.json()
 
             # Extract Lighthouse results
             lighthouse = data.get("lighthouseResult", {})
@@ -844,6 +940,6 @@ class AnalysisService:
         }
 
 
-async def get_analysis_service(db: AsyncSession) -> AnalysisService:
+def get_analysis_service(db: AsyncSession) -> AnalysisService:
     """Dependency to get analysis service."""
     return AnalysisService(db)
@@ -7,9 +7,12 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 from datetime import datetime, timedelta
 from typing import Optional
 from uuid import UUID
+import asyncio
+import hashlib
+import hmac
 import secrets
 
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User
@@ -28,6 +31,18 @@ from app.core.exceptions import (
 )
 from app.config import settings
 
+# Length of the plain selector prefix of a password reset token; the rest is the verifier
+RESET_SELECTOR_LENGTH = 22
+
+# Verified against when no usable password hash exists, so unknown emails take as
+# long to reject as wrong passwords
+_DUMMY_HASH = get_password_hash(secrets.token_urlsafe(16))
+
+
+def _hash_reset_token(token: str) -> bytes:
+    """Keyed digest of a reset token verifier (high-entropy, so no slow hash needed)."""
+    return hmac.new(settings.JWT_SECRET_KEY.encode(), token.encode(), hashlib.sha256).digest()
+
 
 class AuthService:
     """Authentication service for user management."""
@@ -52,18 +67,21 @@ class AuthService:
         if existing_user:
             raise UserAlreadyExistsError(f"User with email {user_data.email} already exists")
 
-        # Create new user
-        hashed_password = get_password_hash(user_data.password)
-        user = User(
-            email=user_data.email,
-            hashed_password=hashed_password,
-            full_name=user_data.full_name,
-            company_name=user_data.company_name,
+        # Create new user (hashing is CPU-bound, keep it off the event loop)
+        hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
+        # INSERT ... RETURNING hands back the stored row without a re-read
+        result = await self.db.execute(
+            insert(User)
+            .values(
+                email=user_data.email,
+                hashed_password=hashed_password,
+                full_name=user_data.full_name,
+                company_name=user_data.company_name,
+            )
+            .returning(User)
         )
-
-        self.db.add(user)
+        user = result.scalar_one()
         await self.db.commit()
-        await self.db.refresh(user)
 
         return user
 
@@ -71,17 +89,23 @@ class AuthService:
         """Authenticate user with email and password."""
         user = await self.get_user_by_email(credentials.email)
 
-        if not user:
-            raise AuthenticationError("Invalid email or password")
+        # Always pay for one hash verification (see _DUMMY_HASH)
+        hashed_password = user.hashed_password if user and user.hashed_password else None
+        password_ok = await asyncio.to_thread(
+            verify_password, credentials.password, hashed_password or _DUMMY_HASH
+        )
 
-        if not verify_password(credentials.password, user.hashed_password):
+        if not hashed_password or not password_ok:
             raise AuthenticationError("Invalid email or password")
 
         if not user.is_active:
             raise AuthenticationError("User account is deactivated")
 
-        # Update last login
-        user.last_login = datetime.utcnow()
+        # Update last login - a targeted UPDATE of just this column; the loaded
+        # user is synchronized in memory without a re-read
+        await self.db.execute(
+            update(User).where(User.id == user.id).values(last_login=datetime.utcnow())
+        )
         await self.db.commit()
 
         return user
@@ -129,10 +153,10 @@ class AuthService:
             raise InvalidTokenError("Invalid token type")
 
         user_id = payload.get("sub")
-        if not user_id:
+        if not isinstance(user_id, UUID):
             raise InvalidTokenError("Invalid token payload")
 
-        user = await self.get_user_by_id(UUID(user_id))
+        user = await self.get_user_by_id(user_id)
         if not user:
             raise InvalidTokenError("User not found")
 
@@ -152,11 +176,14 @@ class AuthService:
             # Don't reveal if user exists
             return None
 
-        # Generate reset token
+        # Generate reset token: a selector to find the row and a verifier to check it
         reset_token = secrets.token_urlsafe(32)
+        selector = reset_token[:RESET_SELECTOR_LENGTH]
+        verifier = reset_token[RESET_SELECTOR_LENGTH:]
 
-        # Store token hash (in production, store in Redis with TTL)
-        user.password_reset_token = get_password_hash(reset_token)
+        # Store the selector plain and only a keyed digest of the verifier
+        user.password_reset_selector = selector
+        user.password_reset_verifier_hash = _hash_reset_token(verifier)
         user.password_reset_expires = datetime.utcnow() + timedelta(hours=1)
         await self.db.commit()
 
@@ -164,34 +191,35 @@ class AuthService:
 
     async def reset_password(self, token: str, new_password: str) -> bool:
         """Reset password using reset token."""
-        # Find user with valid reset token
+        selector = token[:RESET_SELECTOR_LENGTH]
+        verifier = token[RESET_SELECTOR_LENGTH:]
+        if len(selector) < RESET_SELECTOR_LENGTH or not verifier:
+            raise InvalidTokenError("Invalid or expired reset token")
+
+        # Single indexed lookup by selector
         result = await self.db.execute(
             select(User).where(
-                User.password_reset_token.isnot(None),
+                User.password_reset_selector == selector,
                 User.password_reset_expires > datetime.utcnow(),
             )
         )
-        users = result.scalars().all()
-
-        # Verify token against stored hashes
-        valid_user = None
-        for user in users:
-            if verify_password(token, user.password_reset_token):
-                valid_user = user
-                break
+        user = result.scalar_one_or_none()
 
-        if not valid_user:
+        if not user or not hmac.compare_digest(
+            _hash_reset_token(verifier), user.password_reset_verifier_hash
+        ):
             raise InvalidTokenError("Invalid or expired reset token")
 
         # Update password
-        valid_user.hashed_password = get_password_hash(new_password)
-        valid_user.password_reset_token = None
-        valid_user.password_reset_expires = None
+        user.hashed_password = await asyncio.to_thread(get_password_hash, new_password)
+        user.password_reset_selector = None
+        user.password_reset_verifier_hash = None
+        user.password_reset_expires = None
         await self.db.commit()
 
         return True
 
 
-async def get_auth_service(db: AsyncSession) -> AuthService:
+def get_auth_service(db: AsyncSession) -> AuthService:
     """Dependency to get auth service."""
     return AuthService(db)
@@ -7,9 +7,9 @@ AI App Development powered by ServiceVision (https://www.servicevision.net)
 from datetime import datetime
 from typing import Optional, AsyncGenerator
 from uuid import UUID
-import json
+import asyncio
 
-from sqlalchemy import select, func
+from sqlalchemy import Row, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -20,6 +20,7 @@ from app.schemas.chat import (
     ConversationResponse,
     ConversationDetailResponse,
     MessageCreate,
+    MESSAGE_LIST_ADAPTER,
     MessageResponse,
     SendMessageResponse,
 )
@@ -27,6 +28,58 @@ from app.core.exceptions import NotFoundError, ValidationError
 from app.services.ai_service import AIService, analyze_for_phase_advancement
 
 
+WELCOME_WITH_ANALYSIS = (
+    "I've reviewed your website analysis and I'm ready to dive deeper. "
+    "Based on what I found, I have some questions to better understand your business "
+    "and how we can improve your online presence. Let's start: "
+    "What's the primary goal you want to achieve with your website?"
+)
+
+WELCOME_DEFAULT = (
+    "Welcome to Quento! I'm here to help you grow your business. "
+    "To get started, I'd recommend analyzing your website first using the Discover tab - "
+    "this gives me valuable context about your online presence. "
+    "Or, tell me about your business and what you're hoping to achieve."
+)
+
+PLACEHOLDER_RESPONSES: dict[RingPhase, str] = {
+    RingPhase.CORE: (
+        "I'm analyzing what you've shared about your business. "
+        "This helps me understand your core identity and values. "
+        "Could you tell me more about your target audience?"
+    ),
+    RingPhase.DISCOVER: (
+        "Great! Now I'm discovering more about your market position. "
+        "I'll analyze your competitors and identify opportunities. "
+        "What are your main business goals for the next year?"
+    ),
+    RingPhase.PLAN: (
+        "Based on our discussion, I'm putting together a strategic plan. "
+        "This will include actionable recommendations tailored to your business. "
+        "Would you like to focus on any particular area?"
+    ),
+    RingPhase.EXECUTE: (
+        "Here are the action items I've identified for you. "
+        "Each one is designed to move you closer to your goals. "
+        "Let's prioritize which ones to tackle first."
+    ),
+    RingPhase.OPTIMIZE: (
+        "Now we're in the optimization phase. "
+        "I'll help you track progress and refine your strategy. "
+        "What metrics are most important to you?"
+    ),
+}
+
+# Placeholder message counts after which a conversation advances to the next ring
+RING_ADVANCE_THRESHOLDS: dict[RingPhase, float] = {
+    RingPhase.CORE: 5,
+    RingPhase.DISCOVER: 8,
+    RingPhase.PLAN: 10,
+    RingPhase.EXECUTE: 12,
+    RingPhase.OPTIMIZE: float("inf"),
+}
+
+
 class ChatService:
     """Chat service for conversation management."""
 
@@ -48,34 +101,21 @@ class ChatService:
             ring_phase=RingPhase.CORE,
             status=ConversationStatus.ACTIVE,
             business_context=data.initial_context if data else None,
+            message_count=1,  # Welcome message
         )
 
         self.db.add(conversation)
-        await self.db.commit()
-        await self.db.refresh(conversation)
 
         # Add welcome message - reference analysis if available
         if data and data.initial_context:
-            welcome_content = (
-                "I've reviewed your website analysis and I'm ready to dive deeper. "
-                "Based on what I found, I have some questions to better understand your business "
-                "and how we can improve your online presence. Let's start: "
-                "What's the primary goal you want to achieve with your website?"
-            )
+            welcome_content = WELCOME_WITH_ANALYSIS
         else:
-            welcome_content = (
-                "Welcome to Quento! I'm here to help you grow your business. "
-                "To get started, I'd recommend analyzing your website first using the Discover tab - "
-                "this gives me valuable context about your online presence. "
-                "Or, tell me about your business and what you're hoping to achieve."
-            )
+            welcome_content = WELCOME_DEFAULT
 
-        welcome_message = Message(
-            conversation_id=conversation.id,
-            role=MessageRole.ASSISTANT,
-            content=welcome_content,
+        # Saved with the conversation in a single commit
+        conversation.messages.append(
+            Message(role=MessageRole.ASSISTANT, content=welcome_content)
         )
-        self.db.add(welcome_message)
         await self.db.commit()
 
         return conversation
@@ -99,19 +139,39 @@ class ChatService:
 
         return conversation
 
+    async def _verify_ownership(self, conversation_id: UUID, user_id: UUID) -> None:
+        """Check the conversation exists and belongs to the user, without loading it."""
+        result = await self.db.execute(
+            select(Conversation.id)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == user_id,
+            )
+            .limit(1)
+        )
+        if result.scalar_one_or_none() is None:
+            raise NotFoundError(f"Conversation {conversation_id} not found")
+
     async def list_conversations(
         self, user_id: UUID, limit: int = 20, offset: int = 0
-    ) -> list[Conversation]:
-        """List user's conversations."""
+    ) -> list[Row]:
+        """List user's conversations with their message counts (no messages loaded)."""
         result = await self.db.execute(
-            select(Conversation)
-            .options(selectinload(Conversation.messages))
+            select(
+                Conversation.id,
+                Conversation.title,
+                Conversation.ring_phase,
+                Conversation.status,
+                Conversation.message_count,
+                Conversation.created_at,
+                Conversation.updated_at,
+            )
             .where(Conversation.user_id == user_id)
             .order_by(Conversation.updated_at.desc())
             .limit(limit)
             .offset(offset)
         )
-        return list(result.scalars().all())
+        return list(result.all())
 
     async def get_conversation_with_messages(
         self, conversation_id: UUID, user_id: UUID
@@ -119,24 +179,14 @@ class ChatService:
         """Get conversation with all messages."""
         conversation = await self.get_conversation(conversation_id, user_id)
 
-        # Get message count
-        count_result = await self.db.execute(
-            select(func.count(Message.id)).where(
-                Message.conversation_id == conversation_id
-            )
-        )
-        message_count = count_result.scalar() or 0
-
         return ConversationDetailResponse(
             id=conversation.id,
             title=conversation.title,
             ring_phase=conversation.ring_phase,
             status=conversation.status,
             business_context=conversation.business_context,
-            messages=[
-                MessageResponse.model_validate(m)
-                for m in sorted(conversation.messages, key=lambda m: m.created_at)
-            ],
+            # Messages are loaded in created_at order (see Conversation.messages)
+            messages=MESSAGE_LIST_ADAPTER.validate_python(conversation.messages),
             created_at=conversation.created_at,
             updated_at=conversation.updated_at,
         )
@@ -148,10 +198,17 @@ class ChatService:
         content: str,
         role: MessageRole = MessageRole.USER,
         metadata: Optional[dict] = None,
+        _conversation: Optional[Conversation] = None,
     ) -> Message:
-        """Add a message to a conversation."""
-        # Verify conversation exists and belongs to user
-        conversation = await self.get_conversation(conversation_id, user_id)
+        """
+        Add a message to a conversation.
+
+        Pass an already-loaded, owned conversation as _conversation to skip
+        the ownership lookup.
+        """
+        if _conversation is None:
+            # Verify conversation exists and belongs to user
+            await self._verify_ownership(conversation_id, user_id)
 
         message = Message(
             conversation_id=conversation_id,
@@ -161,7 +218,14 @@ class ChatService:
         )
 
         self.db.add(message)
-        conversation.updated_at = datetime.utcnow()
+        await self.db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(
+                message_count=Conversation.message_count + 1,
+                updated_at=datetime.utcnow(),
+            )
+        )
         await self.db.commit()
         await self.db.refresh(message)
 
@@ -181,55 +245,145 @@ class ChatService:
         - Post-processing for quality assurance
         - AI-driven ring phase advancement
         """
-        # Add user message
-        user_message = await self.add_message(
-            conversation_id=conversation_id,
-            user_id=user_id,
-            content=message_data.content,
-            role=MessageRole.USER,
-            metadata={"attachments": message_data.attachments} if message_data.attachments else None,
+        conversation, user_message = await self._start_turn(
+            conversation_id, user_id, message_data
         )
 
-        # Get conversation for context
-        conversation = await self.get_conversation(conversation_id, user_id)
-
         # Generate AI response using enhanced AIService
         ai_service = AIService(self.db)
         ai_response_content = await ai_service.generate_response(
             conversation=conversation,
             user_message=message_data.content,
             user_id=user_id,
+            user_message_id=user_message.id,
         )
 
-        # Add AI message
-        assistant_message = await self.add_message(
-            conversation_id=conversation_id,
-            user_id=user_id,
-            content=ai_response_content,
-            role=MessageRole.ASSISTANT,
+        assistant_message, advancement_task = await self._finish_turn(
+            conversation, message_data.content, ai_response_content
+        )
+
+        return SendMessageResponse(
+            user_message=MessageResponse.model_validate(user_message),
+            assistant_message=MessageResponse.model_validate(assistant_message),
+            session_update=self._session_update(conversation, await advancement_task),
+        )
+
+    async def stream_message(
+        self,
+        conversation_id: UUID,
+        user_id: UUID,
+        message_data: MessageCreate,
+    ) -> AsyncGenerator[dict, None]:
+        """
+        Send a user message and stream the AI response as it is generated.
+
+        Yields events: "user_message" once the message is recorded, a "delta"
+        per chunk of raw response text, "done" with the saved (post-processed)
+        assistant message, and finally "session_update" once phase advancement
+        has been analyzed.
+        The turn is committed once the response completes.
+        """
+        conversation, user_message = await self._start_turn(
+            conversation_id, user_id, message_data
         )
+        yield {
+            "type": "user_message",
+            "message": MessageResponse.model_validate(user_message).model_dump(mode="json"),
+        }
 
-        # Analyze for AI-driven ring phase advancement
-        advancement_analysis = await analyze_for_phase_advancement(
+        ai_service = AIService(self.db)
+        chunks: list[str] = []
+        async for chunk in ai_service.generate_response_stream(
             conversation=conversation,
-            latest_exchange=(message_data.content, ai_response_content),
-            analysis_context=None,  # Will be fetched from DB if needed
+            user_message=message_data.content,
+            user_id=user_id,
+            user_message_id=user_message.id,
+        ):
+            chunks.append(chunk)
+            yield {"type": "delta", "content": chunk}
+
+        # Save the post-processed reply, as send_message does; the fallback
+        # response (on an AI error) has no post-processing
+        postprocessing = ai_service.stream_postprocessing
+        ai_response_content = postprocessing.content if postprocessing else "".join(chunks)
+
+        assistant_message, advancement_task = await self._finish_turn(
+            conversation, message_data.content, ai_response_content
         )
+        # The reply is complete without the advancement decision, so it goes first
+        yield {
+            "type": "done",
+            "assistant_message": MessageResponse.model_validate(
+                assistant_message
+            ).model_dump(mode="json"),
+        }
+        yield {
+            "type": "session_update",
+            "session_update": self._session_update(conversation, await advancement_task),
+        }
 
-        should_advance = advancement_analysis.get("should_advance", False)
-        advancement_confidence = advancement_analysis.get("confidence", 0)
+    async def _start_turn(
+        self, conversation_id: UUID, user_id: UUID, message_data: MessageCreate
+    ) -> tuple[Conversation, Message]:
+        """Load the conversation once for the turn and record the user message."""
+        conversation = await self.get_conversation(conversation_id, user_id)
 
-        return SendMessageResponse(
-            user_message=MessageResponse.model_validate(user_message),
-            assistant_message=MessageResponse.model_validate(assistant_message),
-            session_update={
-                "ring_phase": conversation.ring_phase.value,
-                "should_advance": should_advance,
-                "advancement_confidence": advancement_confidence,
-                "advancement_reason": advancement_analysis.get("reason", ""),
-            },
+        # Flushed, not committed, so the history query sees it and the whole
+        # turn is written in one transaction
+        user_message = Message(
+            conversation_id=conversation_id,
+            role=MessageRole.USER,
+            content=message_data.content,
+            metadata={"attachments": message_data.attachments} if message_data.attachments else None,
+        )
+        conversation.messages.append(user_message)
+        await self.db.flush()
+
+        return conversation, user_message
+
+    async def _finish_turn(
+        self, conversation: Conversation, user_content: str, ai_response_content: str
+    ) -> tuple[Message, asyncio.Task]:
+        """
+        Save the AI message and commit the turn.
+
+        Returns the message and the still-running phase advancement analysis,
+        so callers decide whether to wait for it before responding.
+        """
+        # Analyze for AI-driven ring phase advancement - scheduled before the
+        # AI message is saved so it runs while that write is in flight
+        advancement_task = asyncio.create_task(
+            analyze_for_phase_advancement(
+                conversation=conversation,
+                latest_exchange=(user_content, ai_response_content),
+                analysis_context=None,  # Will be fetched from DB if needed
+            )
         )
 
+        # Add AI message and commit the turn
+        assistant_message = Message(
+            conversation_id=conversation.id,
+            role=MessageRole.ASSISTANT,
+            content=ai_response_content,
+        )
+        conversation.messages.append(assistant_message)
+        # Counts the user message too; incremented in SQL so concurrent turns add up
+        conversation.message_count = Conversation.message_count + 2
+        conversation.updated_at = datetime.utcnow()
+        await self.db.commit()
+
+        return assistant_message, advancement_task
+
+    @staticmethod
+    def _session_update(conversation: Conversation, advancement_analysis: dict) -> dict:
+        """Session update reported to the client after a turn."""
+        return {
+            "ring_phase": conversation.ring_phase.value,
+            "should_advance": advancement_analysis.get("should_advance", False),
+            "advancement_confidence": advancement_analysis.get("confidence", 0),
+            "advancement_reason": advancement_analysis.get("reason", ""),
+        }
+
     async def _generate_placeholder_response(
         self, user_message: str, conversation: Conversation
     ) -> str:
@@ -237,35 +391,7 @@ class ChatService:
         Generate a placeholder response.
         This will be replaced by LangChain/LiteLLM integration.
         """
-        ring_responses = {
-            RingPhase.CORE: (
-                "I'm analyzing what you've shared about your business. "
-                "This helps me understand your core identity and values. "
-                "Could you tell me more about your target audience?"
-            ),
-            RingPhase.DISCOVER: (
-                "Great! Now I'm discovering more about your market position. "
-                "I'll analyze your competitors and identify opportunities. "
-                "What are your main business goals for the next year?"
-            ),
-            RingPhase.PLAN: (
-                "Based on our discussion, I'm putting together a strategic plan. "
-                "This will include actionable recommendations tailored to your business. "
-                "Would you like to focus on any particular area?"
-            ),
-            RingPhase.EXECUTE: (
-                "Here are the action items I've identified for you. "
-                "Each one is designed to move you closer to your goals. "
-                "Let's prioritize which ones to tackle first."
-            ),
-            RingPhase.OPTIMIZE: (
-                "Now we're in the optimization phase. "
-                "I'll help you track progress and refine your strategy. "
-                "What metrics are most important to you?"
-            ),
-        }
-
-        return ring_responses.get(
+        return PLACEHOLDER_RESPONSES.get(
             conversation.ring_phase,
             "Thank you for your message. How can I help you further?"
         )
@@ -273,28 +399,32 @@ class ChatService:
     def _should_advance_ring(self, conversation: Conversation, message: str) -> bool:
         """Determine if conversation should advance to next ring."""
         # Placeholder logic - will be enhanced with AI analysis
-        message_count = len(conversation.messages)
-
-        ring_thresholds = {
-            RingPhase.CORE: 5,
-            RingPhase.DISCOVER: 8,
-            RingPhase.PLAN: 10,
-            RingPhase.EXECUTE: 12,
-            RingPhase.OPTIMIZE: float("inf"),
-        }
+        message_count = conversation.message_count
 
-        threshold = ring_thresholds.get(conversation.ring_phase, 5)
+        threshold = RING_ADVANCE_THRESHOLDS.get(conversation.ring_phase, 5)
         return message_count >= threshold
 
     async def update_ring_phase(
         self, conversation_id: UUID, user_id: UUID, new_phase: RingPhase
     ) -> Conversation:
         """Update conversation ring phase."""
-        conversation = await self.get_conversation(conversation_id, user_id)
-        conversation.ring_phase = new_phase
-        conversation.updated_at = datetime.utcnow()
+        # UPDATE ... RETURNING checks ownership and returns the updated row in one
+        # round-trip, without loading the messages
+        result = await self.db.execute(
+            update(Conversation)
+            .where(
+                Conversation.id == conversation_id,
+                Conversation.user_id == user_id,
+            )
+            .values(ring_phase=new_phase, updated_at=datetime.utcnow())
+            .returning(Conversation)
+        )
+        conversation = result.scalar_one_or_none()
+
+        if not conversation:
+            raise NotFoundError(f"Conversation {conversation_id} not found")
+
         await self.db.commit()
-        await self.db.refresh(conversation)
         return conversation
 
     async def delete_conversation(self, conversation_id: UUID, user_id: UUID) -> bool:
@@ -305,6 +435,6 @@ class ChatService:
         return True
 
 
-async def get_chat_service(db: AsyncSession) -> ChatService:
+def get_chat_service(db: AsyncSession) -> ChatService:
     """Dependency to get chat service."""
     return ChatService(db)
@@ -4,25 +4,154 @@ Strategy Service - Strategy Generation and Management
 AI App Development powered by ServiceVision (https://www.servicevision.net)
 """
 
-from datetime import datetime, date, timedelta
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from datetime import datetime, date, timedelta, timezone
+from heapq import nsmallest
+from operator import itemgetter
+from types import MappingProxyType
 from typing import Optional
 from uuid import UUID
 import asyncio
+import traceback
 
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.db import database
 from app.models.strategy import Strategy, ActionItem, StrategyStatus, ActionStatus, Priority, Effort
 from app.models.analysis import Analysis
 from app.schemas.strategy import (
     StrategyGenerateRequest,
     StrategyResponse,
-    ActionItemResponse,
-    RecommendationResponse,
     ActionItemUpdate,
+    ACTION_ITEM_LIST_ADAPTER,
+    RECOMMENDATION_LIST_ADAPTER,
 )
 from app.core.exceptions import NotFoundError, ValidationError
+from app.config import settings
+
+
+# Shared read-only default for missing sections of analysis results
+_EMPTY = MappingProxyType({})
+
+
+# Priority values as stored in recommendation JSON
+_P_HIGH, _P_MEDIUM, _P_LOW = Priority.HIGH.value, Priority.MEDIUM.value, Priority.LOW.value
+
+
+@dataclass(slots=True, frozen=True)
+class Scores:
+    """Category scores of an analysis, read once from its results."""
+    seo: int
+    content: int
+    mobile: int
+    speed: int
+    social: int
+
+    @classmethod
+    def from_results(cls, results: dict) -> "Scores":
+        """Build from analysis results; missing categories count as 50."""
+        scores = results.get("scores", _EMPTY)
+        return cls(*(scores.get(field.name, 50) for field in fields(cls)))
+
+
+# Action items generated for each weak area: (score, threshold below which the
+# area counts as weak, templates of (title, description, priority, effort,
+# category, days until due))
+_ACTION_TEMPLATES = (
+    ("seo", 80, (
+        ("Add missing meta descriptions",
+         "Ensure all pages have unique, compelling meta descriptions",
+         Priority.HIGH, Effort.LOW, "SEO", 7),
+        ("Optimize image alt texts",
+         "Add descriptive alt text to all images",
+         Priority.MEDIUM, Effort.LOW, "SEO", 14),
+        ("Implement structured data",
+         "Add schema.org markup for better search results",
+         Priority.MEDIUM, Effort.MEDIUM, "SEO", 30),
+    )),
+    ("content", 80, (
+        ("Expand homepage content",
+         "Add more detailed content about services and value proposition",
+         Priority.HIGH, Effort.MEDIUM, "Content", 14),
+        ("Create blog content strategy",
+         "Plan 4 blog posts for the next month",
+         Priority.MEDIUM, Effort.HIGH, "Content", 21),
+    )),
+    ("mobile", 70, (
+        ("Add viewport meta tag",
+         "Ensure proper mobile viewport configuration",
+         Priority.HIGH, Effort.LOW, "Mobile", 3),
+        ("Test mobile responsiveness",
+         "Review and fix mobile layout issues",
+         Priority.MEDIUM, Effort.MEDIUM, "Mobile", 14),
+    )),
+)
+
+
+# Distinct due date offsets used by the templates
+_ACTION_DUE_IN_DAYS = frozenset(
+    template[-1] for _, _, templates in _ACTION_TEMPLATES for template in templates
+)
+
+
+# Strategy content is generated by a fixed number of workers fed from a queue,
+# so a burst of requests waits its turn instead of each holding a pooled
+# database connection at once
+STRATEGY_WORKERS = max(1, min(settings.DB_POOL_SIZE // 2, 4))
+
+_strategy_queue: Optional[asyncio.Queue] = None
+_strategy_workers: list[asyncio.Task] = []
+
+
+async def _strategy_worker(queue: asyncio.Queue) -> None:
+    """Generate queued strategies, one at a time, until cancelled."""
+    while True:
+        strategy_id, analysis_snapshot = await queue.get()
+        try:
+            async with database.async_session_factory() as db:
+                await StrategyService(db)._generate_strategy_content(
+                    strategy_id, analysis_snapshot
+                )
+        except Exception:
+            traceback.print_exc()
+        finally:
+            queue.task_done()
+
+
+def start_strategy_workers() -> asyncio.Queue:
+    """Start the strategy workers on the running loop unless already running there."""
+    global _strategy_queue
+    loop = asyncio.get_running_loop()
+    if _strategy_workers and all(
+        worker.get_loop() is loop and not worker.done() for worker in _strategy_workers
+    ):
+        return _strategy_queue
+
+    stop_strategy_workers()
+    _strategy_queue = asyncio.Queue()
+    _strategy_workers.extend(
+        asyncio.create_task(_strategy_worker(_strategy_queue))
+        for _ in range(STRATEGY_WORKERS)
+    )
+    return _strategy_queue
+
+
+def stop_strategy_workers() -> None:
+    """Cancel the strategy workers (on shutdown)."""
+    for worker in _strategy_workers:
+        if not worker.get_loop().is_closed():
+            worker.cancel()
+    _strategy_workers.clear()
+
+
+# Built strategy responses, keyed by strategy and valid while its updated_at is
+# unchanged (action item updates bump it too)
+STRATEGY_RESPONSE_CACHE_SIZE = 256
+
+_strategy_responses: OrderedDict[UUID, tuple[datetime, StrategyResponse]] = OrderedDict()
 
 
 class StrategyService:
@@ -62,13 +191,33 @@ class StrategyService:
         await self.db.commit()
         await self.db.refresh(strategy)
 
-        # Generate strategy in background
-        asyncio.create_task(self._generate_strategy_content(strategy.id, analysis))
+        # Generate strategy in background, from plain values: the worker runs
+        # after this request's session (which owns the ORM object) is closed
+        analysis_snapshot = {
+            "website_url": analysis.website_url,
+            "results": analysis.results,
+        }
+        await start_strategy_workers().put((strategy.id, analysis_snapshot))
+
+        return strategy
+
+    async def get_strategy_meta(self, strategy_id: UUID, user_id: UUID) -> Strategy:
+        """Get strategy by ID, without its action items."""
+        result = await self.db.execute(
+            select(Strategy).where(
+                Strategy.id == strategy_id,
+                Strategy.user_id == user_id,
+            )
+        )
+        strategy = result.scalar_one_or_none()
+
+        if not strategy:
+            raise NotFoundError(f"Strategy {strategy_id} not found")
 
         return strategy
 
-    async def get_strategy(self, strategy_id: UUID, user_id: UUID) -> Strategy:
-        """Get strategy by ID."""
+    async def get_strategy_with_items(self, strategy_id: UUID, user_id: UUID) -> Strategy:
+        """Get strategy by ID with its action items loaded."""
         result = await self.db.execute(
             select(Strategy)
             .options(selectinload(Strategy.action_items))
@@ -87,10 +236,31 @@ class StrategyService:
     async def get_strategy_response(
         self, strategy_id: UUID, user_id: UUID
     ) -> StrategyResponse:
-        """Get full strategy response."""
-        strategy = await self.get_strategy(strategy_id, user_id)
+        """
+        Get full strategy response.
+
+        Only the strategy's updated_at is read when an up-to-date response
+        is already cached.
+        """
+        updated_at = (
+            await self.db.execute(
+                select(Strategy.updated_at).where(
+                    Strategy.id == strategy_id,
+                    Strategy.user_id == user_id,
+                )
+            )
+        ).scalar_one_or_none()
+        if updated_at is None:
+            raise NotFoundError(f"Strategy {strategy_id} not found")
 
-        return StrategyResponse(
+        cached = _strategy_responses.get(strategy_id)
+        if cached is not None and cached[0] == updated_at:
+            _strategy_responses.move_to_end(strategy_id)
+            return cached[1]
+
+        strategy = await self.get_strategy_with_items(strategy_id, user_id)
+
+        response = StrategyResponse(
             id=strategy.id,
             title=strategy.title,
             status=strategy.status,
@@ -98,19 +268,22 @@ class StrategyService:
             vision_statement=strategy.vision_statement,
             key_strengths=strategy.key_strengths or [],
             critical_gaps=strategy.critical_gaps or [],
-            recommendations=[
-                RecommendationResponse(**r)
-                for r in (strategy.recommendations or [])
-            ],
-            action_items=[
-                ActionItemResponse.model_validate(a)
-                for a in strategy.action_items
-            ],
+            recommendations=RECOMMENDATION_LIST_ADAPTER.validate_python(
+                strategy.recommendations or []
+            ),
+            action_items=ACTION_ITEM_LIST_ADAPTER.validate_python(strategy.action_items),
             ninety_day_priorities=strategy.ninety_day_priorities or [],
             created_at=strategy.created_at,
             updated_at=strategy.updated_at,
         )
 
+        _strategy_responses[strategy_id] = (updated_at, response)
+        _strategy_responses.move_to_end(strategy_id)
+        while len(_strategy_responses) > STRATEGY_RESPONSE_CACHE_SIZE:
+            _strategy_responses.popitem(last=False)
+
+        return response
+
     async def list_strategies(
         self, user_id: UUID, limit: int = 20, offset: int = 0
     ) -> list[Strategy]:
@@ -125,97 +298,94 @@ class StrategyService:
         return list(result.scalars().all())
 
     async def update_action_item(
-        self, user_id: UUID, update: ActionItemUpdate
+        self, user_id: UUID, data: ActionItemUpdate
     ) -> ActionItem:
         """Update an action item status."""
+        # Naive UTC, like the rest of the stored timestamps
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        values = {"status": data.status}
+        if data.status == ActionStatus.COMPLETED:
+            values["completed_at"] = now
+
+        # Ownership check, update and re-read in one statement
         result = await self.db.execute(
-            select(ActionItem)
-            .join(Strategy)
+            update(ActionItem)
             .where(
-                ActionItem.id == update.action_id,
-                Strategy.user_id == user_id,
+                ActionItem.id == data.action_id,
+                ActionItem.strategy.has(Strategy.user_id == user_id),
             )
+            .values(**values)
+            .returning(ActionItem)
         )
         action = result.scalar_one_or_none()
 
         if not action:
-            raise NotFoundError(f"Action item {update.action_id} not found")
-
-        action.status = update.status
-        if update.notes:
-            action.notes = update.notes
-        if update.status == ActionStatus.COMPLETED:
-            action.completed_at = datetime.utcnow()
+            raise NotFoundError(f"Action item {data.action_id} not found")
 
+        # Touch the strategy so cached responses for it are rebuilt
+        await self.db.execute(
+            update(Strategy)
+            .where(Strategy.id == action.strategy_id)
+            .values(updated_at=now)
+        )
         await self.db.commit()
-        await self.db.refresh(action)
 
         return action
 
     async def _generate_strategy_content(
-        self, strategy_id: UUID, analysis: Analysis
+        self, strategy_id: UUID, analysis_snapshot: dict
     ) -> None:
-        """Generate strategy content (background task)."""
-        from app.db.database import async_session_maker
-
-        async with async_session_maker() as db:
-            try:
-                # Get strategy
-                result = await db.execute(
-                    select(Strategy).where(Strategy.id == strategy_id)
+        """Generate strategy content (run by a strategy worker in its own session)."""
+        try:
+            website_url = analysis_snapshot["website_url"]
+            results = analysis_snapshot["results"] or {}
+            overall_score = results.get("overall_score", 50)
+            scores = Scores.from_results(results)
+
+            # Write the generated content straight to the row; nothing
+            # needs to be loaded first
+            await self.db.execute(
+                update(Strategy)
+                .where(Strategy.id == strategy_id)
+                .values(
+                    executive_summary=self._generate_executive_summary(
+                        website_url, overall_score, scores
+                    ),
+                    vision_statement=(
+                        f"Transform {website_url} into a high-performing "
+                        "digital presence that drives measurable business growth "
+                        "through optimized content, improved user experience, and "
+                        "strategic marketing initiatives."
+                    ),
+                    key_strengths=self._identify_strengths(scores, results),
+                    critical_gaps=self._identify_gaps(scores, results),
+                    recommendations=self._generate_recommendations(scores),
+                    ninety_day_priorities=self._generate_90_day_priorities(
+                        scores, results
+                    ),
+                    status=StrategyStatus.READY,
                 )
-                strategy = result.scalar_one_or_none()
-                if not strategy:
-                    return
-
-                results = analysis.results or {}
-
-                # Generate executive summary
-                overall_score = results.get("overall_score", 50)
-                strategy.executive_summary = self._generate_executive_summary(
-                    analysis.website_url, overall_score, results
-                )
-
-                # Generate vision statement
-                strategy.vision_statement = (
-                    f"Transform {analysis.website_url} into a high-performing "
-                    "digital presence that drives measurable business growth "
-                    "through optimized content, improved user experience, and "
-                    "strategic marketing initiatives."
-                )
-
-                # Identify strengths and gaps
-                strategy.key_strengths = self._identify_strengths(results)
-                strategy.critical_gaps = self._identify_gaps(results)
-
-                # Generate recommendations
-                strategy.recommendations = self._generate_recommendations(results)
-
-                # Generate 90-day priorities
-                strategy.ninety_day_priorities = self._generate_90_day_priorities(results)
-
-                # Update status
-                strategy.status = StrategyStatus.READY
-                await db.commit()
-
-                # Generate action items
-                await self._generate_action_items(db, strategy_id, results)
+            )
 
-            except Exception as e:
-                result = await db.execute(
-                    select(Strategy).where(Strategy.id == strategy_id)
-                )
-                strategy = result.scalar_one_or_none()
-                if strategy:
-                    strategy.status = StrategyStatus.FAILED
-                    await db.commit()
+            # Generate action items, committed together with the content. Kept
+            # on this one connection rather than split across two concurrent
+            # sessions: a strategy must never be READY without its items
+            await self._generate_action_items(self.db, strategy_id, scores)
+            await self.db.commit()
+
+        except Exception:
+            await self.db.rollback()
+            await self.db.execute(
+                update(Strategy)
+                .where(Strategy.id == strategy_id)
+                .values(status=StrategyStatus.FAILED)
+            )
+            await self.db.commit()
 
     def _generate_executive_summary(
-        self, url: str, score: int, results: dict
+        self, url: str, score: int, scores: Scores
     ) -> str:
         """Generate executive summary."""
-        scores = results.get("scores", {})
-
         if score >= 80:
             assessment = "performing well"
             outlook = "fine-tuning for excellence"
@@ -232,29 +402,28 @@ class StrategyService:
         return (
             f"Based on our comprehensive analysis, {url} {assessment} "
             f"with an overall score of {score}/100. "
-            f"The website scores {scores.get('seo', 50)}/100 for SEO, "
-            f"{scores.get('content', 50)}/100 for content quality, "
-            f"and {scores.get('mobile', 50)}/100 for mobile experience. "
+            f"The website scores {scores.seo}/100 for SEO, "
+            f"{scores.content}/100 for content quality, "
+            f"and {scores.mobile}/100 for mobile experience. "
             f"Our recommended strategy focuses on {outlook} to maximize "
             "your digital presence and drive business growth."
         )
 
-    def _identify_strengths(self, results: dict) -> list[str]:
+    def _identify_strengths(self, scores: Scores, results: dict) -> list[str]:
         """Identify key strengths from analysis."""
         strengths = []
-        scores = results.get("scores", {})
 
-        if scores.get("seo", 0) >= 70:
+        if scores.seo >= 70:
             strengths.append("Strong SEO foundation")
-        if scores.get("content", 0) >= 70:
+        if scores.content >= 70:
             strengths.append("Quality content presence")
-        if scores.get("mobile", 0) >= 70:
+        if scores.mobile >= 70:
             strengths.append("Good mobile responsiveness")
-        if scores.get("speed", 0) >= 70:
+        if scores.speed >= 70:
             strengths.append("Fast page load times")
 
-        seo = results.get("seo_analysis", {})
-        if seo.get("image_optimization", {}).get("score", 0) >= 80:
+        seo = results.get("seo_analysis", _EMPTY)
+        if seo.get("image_optimization", _EMPTY).get("score", 0) >= 80:
             strengths.append("Well-optimized images")
         if seo.get("has_canonical"):
             strengths.append("Proper canonical URL setup")
@@ -264,88 +433,89 @@ class StrategyService:
 
         return strengths
 
-    def _identify_gaps(self, results: dict) -> list[str]:
+    def _identify_gaps(self, scores: Scores, results: dict) -> list[str]:
         """Identify critical gaps from analysis."""
         gaps = []
-        scores = results.get("scores", {})
 
-        if scores.get("seo", 100) < 50:
+        if scores.seo < 50:
             gaps.append("SEO optimization needs work")
-        if scores.get("content", 100) < 50:
+        if scores.content < 50:
             gaps.append("Content quality and depth")
-        if scores.get("mobile", 100) < 50:
+        if scores.mobile < 50:
             gaps.append("Mobile user experience")
-        if scores.get("speed", 100) < 50:
+        if scores.speed < 50:
             gaps.append("Page speed optimization")
-        if scores.get("social", 100) < 50:
+        if scores.social < 50:
             gaps.append("Social media integration")
 
-        content = results.get("content_analysis", {})
-        for issue in content.get("issues", []):
-            if issue not in [g.lower() for g in gaps]:
+        content = results.get("content_analysis", _EMPTY)
+        seen = {gap.lower() for gap in gaps}
+        for issue in content.get("issues", ()):
+            key = issue.lower()
+            if key not in seen:
+                seen.add(key)
                 gaps.append(issue.capitalize())
 
         return gaps[:5]  # Top 5 gaps
 
-    def _generate_recommendations(self, results: dict) -> list[dict]:
+    def _generate_recommendations(self, scores: Scores) -> list[dict]:
         """Generate strategic recommendations."""
         recommendations = []
-        scores = results.get("scores", {})
 
         # SEO recommendations
-        if scores.get("seo", 100) < 80:
+        if scores.seo < 80:
             recommendations.append({
                 "id": "seo-optimization",
                 "title": "Enhance SEO Performance",
-                "priority": Priority.HIGH.value,
+                "priority": _P_HIGH,
                 "summary": "Implement technical SEO improvements to boost search visibility",
                 "impact": "Increase organic traffic by 30-50%",
-                "current_state": f"Current SEO score: {scores.get('seo', 50)}/100",
+                "current_state": f"Current SEO score: {scores.seo}/100",
                 "target_state": "Target SEO score: 85+/100",
             })
 
         # Content recommendations
-        if scores.get("content", 100) < 80:
+        if scores.content < 80:
             recommendations.append({
                 "id": "content-strategy",
                 "title": "Content Strategy Enhancement",
-                "priority": Priority.HIGH.value,
+                "priority": _P_HIGH,
                 "summary": "Develop comprehensive content that addresses user needs",
                 "impact": "Improve engagement and reduce bounce rate",
-                "current_state": f"Current content score: {scores.get('content', 50)}/100",
+                "current_state": f"Current content score: {scores.content}/100",
                 "target_state": "Target content score: 80+/100",
             })
 
         # Mobile recommendations
-        if scores.get("mobile", 100) < 70:
+        if scores.mobile < 70:
             recommendations.append({
                 "id": "mobile-optimization",
                 "title": "Mobile Experience Optimization",
-                "priority": Priority.MEDIUM.value,
+                "priority": _P_MEDIUM,
                 "summary": "Optimize for mobile users who make up 60%+ of traffic",
                 "impact": "Capture more mobile conversions",
-                "current_state": f"Current mobile score: {scores.get('mobile', 50)}/100",
+                "current_state": f"Current mobile score: {scores.mobile}/100",
                 "target_state": "Target mobile score: 90+/100",
             })
 
         # Speed recommendations
-        if scores.get("speed", 100) < 70:
+        if scores.speed < 70:
             recommendations.append({
                 "id": "speed-improvement",
                 "title": "Page Speed Improvement",
-                "priority": Priority.MEDIUM.value,
+                "priority": _P_MEDIUM,
                 "summary": "Reduce load times for better user experience",
                 "impact": "Every 1s improvement = 7% more conversions",
-                "current_state": f"Current speed score: {scores.get('speed', 50)}/100",
+                "current_state": f"Current speed score: {scores.speed}/100",
                 "target_state": "Target speed score: 85+/100",
             })
 
         # Social recommendations
-        if scores.get("social", 100) < 60:
+        if scores.social < 60:
             recommendations.append({
                 "id": "social-presence",
                 "title": "Build Social Presence",
-                "priority": Priority.LOW.value,
+                "priority": _P_LOW,
                 "summary": "Strengthen social media integration and presence",
                 "impact": "Increase brand awareness and referral traffic",
                 "current_state": "Limited social integration",
@@ -354,22 +524,22 @@ class StrategyService:
 
         return recommendations
 
-    def _generate_90_day_priorities(self, results: dict) -> list[str]:
+    def _generate_90_day_priorities(self, scores: Scores, results: dict) -> list[str]:
         """Generate 90-day priority list."""
         priorities = []
-        scores = results.get("scores", {})
 
         # Quick wins first
-        for win in results.get("quick_wins", [])[:2]:
+        for win in results.get("quick_wins", ())[:2]:
             priorities.append(f"Quick Win: {win}")
 
         # Based on lowest scores
-        score_priorities = sorted(
-            [(k, v) for k, v in scores.items()],
-            key=lambda x: x[1]
+        score_priorities = nsmallest(
+            3,
+            ((field.name, getattr(scores, field.name)) for field in fields(scores)),
+            key=itemgetter(1),
         )
 
-        for area, score in score_priorities[:3]:
+        for area, score in score_priorities:
             if score < 70:
                 priorities.append(f"Improve {area.upper()} score from {score} to 70+")
 
@@ -383,99 +553,38 @@ class StrategyService:
         return priorities[:5]
 
     async def _generate_action_items(
-        self, db: AsyncSession, strategy_id: UUID, results: dict
+        self, db: AsyncSession, strategy_id: UUID, scores: Scores
     ) -> None:
-        """Generate action items for the strategy."""
-        scores = results.get("scores", {})
-        today = date.today()
-
-        action_items = []
-
-        # SEO actions
-        if scores.get("seo", 100) < 80:
-            action_items.extend([
-                ActionItem(
-                    strategy_id=strategy_id,
-                    title="Add missing meta descriptions",
-                    description="Ensure all pages have unique, compelling meta descriptions",
-                    priority=Priority.HIGH,
-                    effort=Effort.SMALL,
-                    category="SEO",
-                    due_date=today + timedelta(days=7),
-                ),
-                ActionItem(
-                    strategy_id=strategy_id,
-                    title="Optimize image alt texts",
-                    description="Add descriptive alt text to all images",
-                    priority=Priority.MEDIUM,
-                    effort=Effort.SMALL,
-                    category="SEO",
-                    due_date=today + timedelta(days=14),
-                ),
-                ActionItem(
-                    strategy_id=strategy_id,
-                    title="Implement structured data",
-                    description="Add schema.org markup for better search results",
-                    priority=Priority.MEDIUM,
-                    effort=Effort.MEDIUM,
-                    category="SEO",
-                    due_date=today + timedelta(days=30),
-                ),
-            ])
+        """
+        Generate action items for the strategy.
 
-        # Content actions
-        if scores.get("content", 100) < 80:
-            action_items.extend([
-                ActionItem(
-                    strategy_id=strategy_id,
-                    title="Expand homepage content",
-                    description="Add more detailed content about services and value proposition",
-                    priority=Priority.HIGH,
-                    effort=Effort.MEDIUM,
-                    category="Content",
-                    due_date=today + timedelta(days=14),
-                ),
-                ActionItem(
-                    strategy_id=strategy_id,
-                    title="Create blog content strategy",
-                    description="Plan 4 blog posts for the next month",
-                    priority=Priority.MEDIUM,
-                    effort=Effort.LARGE,
-                    category="Content",
-                    due_date=today + timedelta(days=21),
-                ),
-            ])
-
-        # Mobile actions
-        if scores.get("mobile", 100) < 70:
-            action_items.extend([
-                ActionItem(
-                    strategy_id=strategy_id,
-                    title="Add viewport meta tag",
-                    description="Ensure proper mobile viewport configuration",
-                    priority=Priority.HIGH,
-                    effort=Effort.SMALL,
-                    category="Mobile",
-                    due_date=today + timedelta(days=3),
-                ),
-                ActionItem(
-                    strategy_id=strategy_id,
-                    title="Test mobile responsiveness",
-                    description="Review and fix mobile layout issues",
-                    priority=Priority.MEDIUM,
-                    effort=Effort.MEDIUM,
-                    category="Mobile",
-                    due_date=today + timedelta(days=14),
-                ),
-            ])
-
-        # Add all action items
-        for item in action_items:
-            db.add(item)
-
-        await db.commit()
-
-
-async def get_strategy_service(db: AsyncSession) -> StrategyService:
+        Only stages the rows; the caller owns the transaction and commits.
+        """
+        today = date.today()
+        due_dates = {days: today + timedelta(days=days) for days in _ACTION_DUE_IN_DAYS}
+
+        action_items = [
+            {
+                "strategy_id": strategy_id,
+                "title": title,
+                "description": description,
+                "priority": priority,
+                "effort": effort,
+                "category": category,
+                "due_date": due_dates[due_in_days],
+            }
+            for area, threshold, templates in _ACTION_TEMPLATES
+            if getattr(scores, area) < threshold
+            for title, description, priority, effort, category, due_in_days in templates
+        ]
+
+        if not action_items:
+            return
+
+        # Insert all action items in one executemany round trip
+        await db.execute(insert(ActionItem), action_items)
+
+
+def get_strategy_service(db: AsyncSession) -> StrategyService:
     """Dependency to get strategy service."""
     return StrategyService(db)
@@ -0,0 +1,124 @@
+"""
+Website Parser - Extracts the data used by website analysis from fetched HTML
+
+AI App Development powered by ServiceVision (https://www.servicevision.net)
+
+Kept free of app and database imports so it can run in worker processes.
+"""
+
+from typing import Optional
+from urllib.parse import urlparse
+
+from lxml import etree
+
+# Page chrome and code left out of the extracted website data
+_SKIPPED = (
+    "not(ancestor-or-self::*[self::script or self::style or self::nav or self::footer "
+    "or self::header])"
+)
+# Text inside these isn't page content either (template markup, ruby annotations)
+_CONTENT_TEXT = (
+    "text()[not(ancestor::*[self::script or self::style or self::nav or self::footer "
+    "or self::header or self::template or self::rt or self::rp])]"
+)
+
+# Compiled once; each call is a single C-level scan of the parsed tree
+_TEXT = etree.XPath(f"//{_CONTENT_TEXT}", smart_strings=False)
+_ELEMENT_TEXT = etree.XPath(f".//{_CONTENT_TEXT}", smart_strings=False)
+_TITLE = etree.XPath(f"(//title[{_SKIPPED}])[1]")
+_META_BY_NAME = etree.XPath(f"(//meta[@name=$name][{_SKIPPED}])[1]")
+_META_BY_PROPERTY = etree.XPath(f"(//meta[@property=$property][{_SKIPPED}])[1]")
+_HAS_VIEWPORT = etree.XPath(f"boolean(//meta[@name='viewport'][{_SKIPPED}])")
+_LINK_RELS = etree.XPath(f"//link[{_SKIPPED}]/@rel", smart_strings=False)
+_HREFS = etree.XPath(f"//a[{_SKIPPED}]/@href", smart_strings=False)
+_IMAGES = etree.XPath(f"count(//img[{_SKIPPED}])")
+_IMAGES_WITH_ALT = etree.XPath(f"count(//img[@alt][{_SKIPPED}])")
+_PARAGRAPHS = etree.XPath(f"//p[{_SKIPPED}]")
+_H1 = etree.XPath(f"//h1[{_SKIPPED}]")
+_H2 = etree.XPath(f"//h2[{_SKIPPED}]")
+
+_ASCII_SPACES = " \n\t\x0c\r"
+
+
+def _element_text(element: etree._Element) -> str:
+    """Stripped text of an element, like BeautifulSoup's get_text(strip=True)."""
+    return "".join(s.strip() for s in _ELEMENT_TEXT(element))
+
+
+def _single_string(element: etree._Element) -> Optional[str]:
+    """An element's only string, like BeautifulSoup's Tag.string."""
+    while True:
+        if len(element) == 0:
+            text = element.text
+            # BeautifulSoup collapses whitespace-only strings outside <pre>/<textarea>
+            if (
+                text is not None
+                and not text.strip(_ASCII_SPACES)
+                and next(element.iterancestors("pre", "textarea"), None) is None
+            ):
+                return "\n" if "\n" in text else " "
+            return text
+        if element.text or len(element) > 1 or element[0].tail:
+            return None
+        element = element[0]
+
+
+def parse_website(html: str, url: str, final_url: str, status_code: int) -> dict:
+    """Parse fetched website HTML into the data used by the analyzers."""
+    # Parse from bytes so an XML encoding declaration doesn't trip lxml
+    tree = etree.HTML(html.encode("utf-8"), etree.HTMLParser(encoding="utf-8"))
+    if tree is None:
+        tree = etree.Element("html")
+
+    netloc = urlparse(url).netloc
+    hrefs = _HREFS(tree)
+    internal_links = sum(1 for href in hrefs if href.startswith("/") or netloc in href)
+    external_links = sum(
+        1 for href in hrefs if href.startswith("http") and netloc not in href
+    )
+
+    # Key paragraphs (first 10 substantive ones)
+    paragraphs: list[str] = []
+    for p in _PARAGRAPHS(tree):
+        text = _element_text(p)
+        if len(text) > 50:  # Only meaningful paragraphs
+            paragraphs.append(text)
+            if len(paragraphs) == 10:
+                break
+
+    def get_meta(meta_name: str) -> Optional[str]:
+        tags = _META_BY_NAME(tree, name=meta_name) or _META_BY_PROPERTY(
+            tree, property=f"og:{meta_name}"
+        )
+        return tags[0].get("content") if tags else None
+
+    # Extract main content text for RAG context, the same as
+    # soup.get_text(separator="\n", strip=True) after removing skipped tags
+    strings = _TEXT(tree)
+    raw_text = "\n".join(filter(None, (s.strip() for s in strings)))
+    # Limit to ~8000 chars for context window efficiency
+    raw_content = raw_text[:8000] if len(raw_text) > 8000 else raw_text
+
+    titles = _TITLE(tree)
+
+    return {
+        "url": final_url,
+        "status_code": status_code,
+        "title": _single_string(titles[0]) if titles else None,
+        "meta_description": get_meta("description"),
+        "meta_keywords": get_meta("keywords"),
+        "h1_tags": [_element_text(h) for h in _H1(tree)],
+        "h2_tags": [_element_text(h) for h in _H2(tree)],
+        "images": int(_IMAGES(tree)),
+        "images_with_alt": int(_IMAGES_WITH_ALT(tree)),
+        "links": len(hrefs),
+        "internal_links": internal_links,
+        "external_links": external_links,
+        "has_viewport": _HAS_VIEWPORT(tree),
+        "has_canonical": any("canonical" in rel.split() for rel in _LINK_RELS(tree)),
+        "word_count": len("".join(strings).split()),
+        "html_size": len(html),
+        # RAG context fields
+        "raw_content": raw_content,
+        "key_paragraphs": paragraphs,
+    }
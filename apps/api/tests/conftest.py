@@ -4,20 +4,33 @@ Test Configuration and Fixtures
 AI App Development powered by ServiceVision (https://www.servicevision.net)
 """
 
-import asyncio
 import os
-from typing import AsyncGenerator, Generator
-from uuid import uuid4
+from types import SimpleNamespace
+from typing import AsyncGenerator
+from uuid import UUID, uuid4
 
+import httpx
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
+try:
+    import uvloop
+except ImportError:  # Windows, or dev env without uvloop
+    uvloop = None
+
+# Test database URL (in-memory SQLite for tests)
+TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+
 # Set test environment variables BEFORE importing app modules
 os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-for-pytest")
-os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+# Always in memory, even if the shell or .env points DATABASE_URL at a real database
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+# Test-only: cheap argon2 parameters so register/login don't dominate the run
+os.environ.setdefault("PASSWORD_HASH_TIME_COST", "1")
+os.environ.setdefault("PASSWORD_HASH_MEMORY_KIB", "1024")
 
 # Clear settings cache to ensure test env vars are used
 from app.config import get_settings
@@ -26,24 +39,81 @@ get_settings.cache_clear()
 from app.main import app
 from app.db.database import get_db, Base
 from app.models.user import User
-from app.core.security import create_access_token
+from app.core.security import create_access_token, create_refresh_token, get_password_hash
+from app.core.security import _token_claims_cache
+from app.services.ai_service import (
+    _analysis_contexts,
+    _build_rag_sections,
+    _preprocess_message,
+    _response_cache,
+)
+from app.services.analysis_service import _analysis_progress
+from app.services.strategy_service import _strategy_responses
+
+
+TEST_USER_PASSWORD = "TestPassword123!"
+
+# Canned replies for outbound calls, so no test waits on the network
+CANNED_COMPLETION = "Thanks for sharing! What are your main business goals this year?"
+STATIC_HTML = (
+    "<html><head><title>Example</title>"
+    '<meta name="description" content="An example site"></head>'
+    "<body><h1>Example</h1><p>Welcome to the example site.</p></body></html>"
+)
+
+
+async def _fake_acompletion(**kwargs):
+    """Stand-in for litellm.acompletion answering with CANNED_COMPLETION."""
+    if kwargs.get("stream"):
+        async def stream():
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=CANNED_COMPLETION))]
+            )
+        return stream()
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=CANNED_COMPLETION))]
+    )
 
 
-# Test database URL (in-memory SQLite for tests)
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+def _fake_http_response(request: httpx.Request) -> httpx.Response:
+    """Answer outbound website / API fetches with a static page."""
+    return httpx.Response(200, text=STATIC_HTML, headers={"content-type": "text/html"})
 
 
-@pytest.fixture(scope="session")
-def event_loop() -> Generator:
-    """Create event loop for async tests."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+if uvloop is not None:
 
+    def pytest_asyncio_loop_factories(config, item):
+        """Run async tests on uvloop where it's available (it is not on Windows)."""
+        return {"uvloop": uvloop.new_event_loop}
 
-@pytest_asyncio.fixture(scope="function")
-async def test_engine():
-    """Create test database engine."""
+
+@pytest_asyncio.fixture(autouse=True)
+async def mock_external_calls(monkeypatch):
+    """Stub the LLM and the shared outbound HTTP client (tests may override)."""
+    monkeypatch.setattr("app.services.ai_service.acompletion", _fake_acompletion)
+    async with httpx.AsyncClient(
+        transport=httpx.MockTransport(_fake_http_response)
+    ) as http_client:
+        monkeypatch.setattr("app.services.analysis_service._http_client", http_client)
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    """Forget everything cached in-process after each test (the test user keeps one ID)."""
+    yield
+    _token_claims_cache.clear()
+    _response_cache.clear()
+    _analysis_contexts.clear()
+    _analysis_progress.clear()
+    _strategy_responses.clear()
+    _preprocess_message.cache_clear()
+    _build_rag_sections.cache_clear()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def _schema_engine():
+    """Create the test database engine and schema once per session."""
     engine = create_async_engine(
         TEST_DATABASE_URL,
         connect_args={"check_same_thread": False},
@@ -52,11 +122,23 @@ async def test_engine():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield engine
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
     await engine.dispose()
 
 
+@pytest_asyncio.fixture(scope="function")
+async def test_engine(_schema_engine):
+    """
+    Test database engine, emptied after each test.
+
+    Tests commit through several sessions (background tasks, streaming), so
+    rows are deleted afterwards rather than rolled back.
+    """
+    yield _schema_engine
+    async with _schema_engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            await conn.execute(table.delete())
+
+
 @pytest_asyncio.fixture(scope="function")
 async def test_session(test_engine) -> AsyncGenerator[AsyncSession, None]:
     """Create test database session."""
@@ -69,65 +151,129 @@ async def test_session(test_engine) -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-@pytest_asyncio.fixture(scope="function")
-async def client(test_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
-    """Create test HTTP client with test database."""
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def _http_clients() -> AsyncGenerator[tuple[AsyncClient, AsyncClient], None]:
+    """
+    Two in-process clients (anonymous, authenticated) shared by the whole run.
+
+    Tests can hold both at once, e.g. the user isolation tests, so they are
+    kept apart. Per-test state (db override, headers) is reset by the
+    function-scoped fixtures below.
+    """
+    transport = ASGITransport(app=app)
+    anonymous = AsyncClient(transport=transport, base_url="http://test")
+    authenticated = AsyncClient(transport=transport, base_url="http://test")
+    yield anonymous, authenticated
+    await anonymous.aclose()
+    await authenticated.aclose()
+
+
+def _override_db(test_session: AsyncSession) -> None:
+    """Point the app's get_db dependency at the test session."""
 
     async def override_get_db():
         yield test_session
 
     app.dependency_overrides[get_db] = override_get_db
 
-    transport = ASGITransport(app=app)
-    async with AsyncClient(transport=transport, base_url="http://test") as ac:
-        yield ac
 
+@pytest_asyncio.fixture(scope="function")
+async def client(
+    test_session: AsyncSession, _http_clients: tuple[AsyncClient, AsyncClient]
+) -> AsyncGenerator[AsyncClient, None]:
+    """Test HTTP client using the test database."""
+    ac = _http_clients[0]
+    _override_db(test_session)
+    yield ac
+    # Tests may authenticate the shared client; don't leak that to the next one
+    ac.headers.pop("Authorization", None)
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(scope="session")
+def test_user_password_hash() -> str:
+    """Hash the test user's password once; password hashing is deliberately slow."""
+    return get_password_hash(TEST_USER_PASSWORD)
+
+
+@pytest.fixture(scope="session")
+def test_user_id() -> UUID:
+    """One ID for the test user across the session, so its tokens can be reused."""
+    return uuid4()
+
+
+@pytest.fixture(scope="session")
+def test_user_tokens(test_user_id: UUID) -> dict:
+    """Sign the test user's access and refresh tokens once per session."""
+    return {
+        "access_token": create_access_token(subject=test_user_id),
+        "refresh_token": create_refresh_token(subject=test_user_id),
+    }
+
+
 @pytest_asyncio.fixture(scope="function")
-async def test_user(test_session: AsyncSession) -> User:
+async def test_user(
+    test_session: AsyncSession, test_user_id: UUID, test_user_password_hash: str
+) -> User:
     """Create a test user."""
-    from app.services.auth_service import AuthService
-    from app.schemas.auth import UserCreate
-
-    service = AuthService(test_session)
-    user_data = UserCreate(
+    user = User(
+        id=test_user_id,
         email=f"test_{uuid4().hex[:8]}@example.com",
-        password="TestPassword123!",
+        hashed_password=test_user_password_hash,
         full_name="Test User",
         company_name="Test Company",
     )
+    test_session.add(user)
+    await test_session.commit()
+    return user
 
-    auth_response = await service.register(user_data)
-    return auth_response.user
+
+@pytest_asyncio.fixture(scope="function")
+async def registered_user(test_user: User, test_user_tokens: dict) -> dict:
+    """
+    A known-good account with its credentials and tokens.
+
+    Stands in for registering over HTTP: the user row reuses the cached
+    password hash and the session's tokens.
+    """
+    return {
+        "data": {"email": test_user.email, "password": TEST_USER_PASSWORD},
+        "tokens": test_user_tokens,
+    }
 
 
 @pytest_asyncio.fixture(scope="function")
-async def auth_headers(test_user: User) -> dict:
+async def auth_headers(test_user: User, test_user_tokens: dict) -> dict:
     """Create authentication headers for test user."""
-    token = create_access_token(subject=test_user.id)
-    return {"Authorization": f"Bearer {token}"}
+    return {"Authorization": f"Bearer {test_user_tokens['access_token']}"}
 
 
 @pytest_asyncio.fixture(scope="function")
 async def authenticated_client(
-    test_session: AsyncSession, auth_headers: dict
+    test_session: AsyncSession,
+    auth_headers: dict,
+    _http_clients: tuple[AsyncClient, AsyncClient],
 ) -> AsyncGenerator[AsyncClient, None]:
-    """Create authenticated test client (separate from unauthenticated client)."""
-
-    async def override_get_db():
-        yield test_session
-
-    app.dependency_overrides[get_db] = override_get_db
+    """Authenticated test client (separate from the unauthenticated client)."""
+    ac = _http_clients[1]
+    _override_db(test_session)
+    ac.headers.update(auth_headers)
+    yield ac
+    ac.headers.pop("Authorization", None)
+    app.dependency_overrides.clear()
 
-    transport = ASGITransport(app=app)
-    async with AsyncClient(
-        transport=transport, base_url="http://test", headers=auth_headers
-    ) as ac:
-        yield ac
 
-    app.dependency_overrides.clear()
+@pytest_asyncio.fixture(scope="function")
+async def second_user_client(
+    client: AsyncClient, test_session: AsyncSession, test_user_password_hash: str
+) -> AsyncClient:
+    """Client authenticated as a second user, for isolation tests."""
+    user = User(email="second@example.com", hashed_password=test_user_password_hash)
+    test_session.add(user)
+    await test_session.commit()
+    # client's teardown removes the header again
+    client.headers["Authorization"] = f"Bearer {create_access_token(subject=user.id)}"
+    return client
 
 
 # Test data fixtures
@@ -142,16 +288,6 @@ def valid_user_data() -> dict:
     }
 
 
-@pytest.fixture
-def invalid_password_data() -> dict:
-    """User data with invalid password (no special character)."""
-    return {
-        "email": "test@example.com",
-        "password": "weakpassword123",  # No special character
-        "full_name": "Test User",
-    }
-
-
 @pytest.fixture
 def valid_analysis_data() -> dict:
     """Valid analysis creation data."""
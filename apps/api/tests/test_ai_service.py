@@ -0,0 +1,390 @@
+"""
+AI Service Pre/Post-processing Tests
+
+AI App Development powered by ServiceVision (https://www.servicevision.net)
+"""
+
+import re
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.analysis import Analysis, AnalysisStatus
+
+from app.models.conversation import Conversation, Message, MessageRole, RingPhase
+from app.models.user import User
+from app.services.ai_service import (
+    SYSTEM_PROMPTS,
+    AIService,
+    PreprocessResult,
+    ResponseCache,
+    UserIntent,
+    build_optimized_rag_context,
+    invalidate_analysis_context,
+    _detect_intent,
+    _detect_sentiment,
+    _extract_action_items,
+    _trie_pattern,
+    preprocess_user_message,
+)
+
+
+class TestDetectIntent:
+    """Tests for user intent detection."""
+
+    def test_concern_takes_precedence(self):
+        """Concern indicators should win even when agreement comes first."""
+        assert _detect_intent("yes, but i'm worried about cost") == UserIntent.CONCERN
+
+    def test_anchored_agreement(self):
+        """Agreement prefixes should only count at the start of the message."""
+        assert _detect_intent("sounds good to me") == UserIntent.AGREEMENT
+        assert _detect_intent("it sounds good") == UserIntent.STATEMENT
+
+    def test_question_mark(self):
+        """A trailing question mark should be detected as a question."""
+        assert _detect_intent("our pricing page?") == UserIntent.QUESTION
+
+    def test_plain_statement(self):
+        """Messages without indicators should be statements."""
+        assert _detect_intent("we sell handmade furniture") == UserIntent.STATEMENT
+
+
+class TestDetectSentiment:
+    """Tests for sentiment detection."""
+
+    def test_positive(self):
+        """Should detect positive sentiment."""
+        assert _detect_sentiment("this is great progress") == "positive"
+
+    def test_negative(self):
+        """Should detect negative sentiment."""
+        assert _detect_sentiment("i'm stuck and frustrated") == "negative"
+
+    def test_whole_words_only(self):
+        """Should not match sentiment words inside longer words."""
+        assert _detect_sentiment("we sell hardware and badges") == "neutral"
+
+
+class TestPreprocessUserMessage:
+    """Tests for user message pre-processing."""
+
+    def test_quick_reply_skips_sentiment_and_references(self):
+        """One- or two-word replies should only be classified by intent."""
+        result = preprocess_user_message("Remember, stuck?", [], RingPhase.CORE)
+
+        assert result.intent == UserIntent.QUESTION
+        assert result.sentiment == "neutral"
+        assert result.references_previous is False
+        assert result.message_length == "short"
+
+    def test_longer_message_gets_full_analysis(self):
+        """Longer messages should still get sentiment and reference detection."""
+        result = preprocess_user_message(
+            "Remember the homepage? I'm stuck on it", [], RingPhase.CORE
+        )
+
+        assert result.sentiment == "negative"
+        assert result.references_previous is True
+
+    def test_repeated_message_is_cached(self):
+        """Identical messages should reuse the cached result."""
+        message = "What should we focus on first for the new website?"
+        first = preprocess_user_message(message, [], RingPhase.CORE)
+
+        assert preprocess_user_message(message, [], RingPhase.PLAN) is first
+
+
+class TestExtractActionItems:
+    """Tests for action item extraction."""
+
+    def test_extracts_lists_and_labels_in_order(self):
+        """Should extract numbered, bulleted, and labeled items in document order."""
+        response = (
+            "Here's the plan:\n"
+            "1. Rewrite the homepage headline\n"
+            "- Add testimonials to the pricing page\n"
+            "Priority 2: Launch a monthly newsletter\n"
+            "- Short\n"
+        )
+
+        assert _extract_action_items(response) == [
+            "Rewrite the homepage headline",
+            "Add testimonials to the pricing page",
+            "Launch a monthly newsletter",
+        ]
+
+    def test_limits_to_ten_items(self):
+        """Should return at most ten items."""
+        response = "\n".join(f"{i}. Complete onboarding task {i}" for i in range(1, 20))
+
+        assert len(_extract_action_items(response)) == 10
+
+
+class TestGenerateResponseStream:
+    """Tests for streamed response generation."""
+
+    async def test_coalesces_small_deltas(
+        self, test_session: AsyncSession, test_user: User, monkeypatch
+    ):
+        """Should yield the streamed text in batches of at least the threshold."""
+        deltas = ["Tell ", "me ", "about ", "your ", "customers", None, " and ", "goals?"]
+
+        async def fake_acompletion(**kwargs):
+            async def stream():
+                for delta in deltas:
+                    yield SimpleNamespace(
+                        choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))]
+                    )
+            return stream()
+
+        monkeypatch.setattr("app.services.ai_service.acompletion", fake_acompletion)
+        monkeypatch.setattr("app.services.ai_service.settings.STREAM_COALESCE_CHARS", 10)
+        monkeypatch.setattr("app.services.ai_service.settings.STREAM_COALESCE_SECONDS", 60)
+
+        conversation = Conversation(user_id=test_user.id, ring_phase=RingPhase.CORE)
+        test_session.add(conversation)
+        await test_session.commit()
+
+        service = AIService(test_session)
+        stream = service.generate_response_stream(conversation, "Hi", test_user.id)
+        chunks = [chunk async for chunk in stream]
+
+        assert chunks == ["Tell me about ", "your customers", " and goals?"]
+        assert service.stream_postprocessing.has_question is True
+
+
+class TestResponseCache:
+    """Tests for the LLM response cache."""
+
+    MESSAGES = [{"role": "system", "content": "prompt"}, {"role": "user", "content": "x"}]
+
+    def test_equivalent_messages_share_a_key(self):
+        """Case, punctuation and spacing differences should not change the key."""
+        user_id = uuid4()
+        key = ResponseCache.key("model", user_id, self.MESSAGES, "What is SEO?")
+
+        assert ResponseCache.key("model", user_id, self.MESSAGES, "what is  seo") == key
+        assert ResponseCache.key("model", user_id, self.MESSAGES, "what is ppc") != key
+        assert ResponseCache.key("model", uuid4(), self.MESSAGES, "What is SEO?") != key
+
+    def test_evicts_least_recently_used(self):
+        """Should keep at most maxsize entries, dropping the least recently used."""
+        cache = ResponseCache(maxsize=2, ttl_seconds=60)
+        cache.set(b"a", "A")
+        cache.set(b"b", "B")
+        cache.get(b"a")
+        cache.set(b"c", "C")
+
+        assert cache.get(b"a") == "A"
+        assert cache.get(b"b") is None
+        assert cache.get(b"c") == "C"
+
+    def test_expired_entries_are_misses(self):
+        """Entries past their time-to-live should not be returned."""
+        cache = ResponseCache(maxsize=2, ttl_seconds=0)
+        cache.set(b"a", "A")
+
+        assert cache.get(b"a") is None
+
+
+class TestGetAnalysisContext:
+    """Tests for the cached analysis context lookup."""
+
+    async def _add_analysis(self, session: AsyncSession, user: User, title: str) -> Analysis:
+        analysis = Analysis(
+            user_id=user.id,
+            website_url="https://example.com",
+            status=AnalysisStatus.COMPLETED,
+            results={"overall_score": 70, "website_content": {"title": title}},
+            completed_at=datetime.utcnow(),
+        )
+        session.add(analysis)
+        await session.commit()
+        return analysis
+
+    async def test_cached_until_invalidated(self, test_session: AsyncSession, test_user: User):
+        """Should reuse the cached context until a new analysis invalidates it."""
+        service = AIService(test_session)
+        assert await service._get_analysis_context(test_user.id) is None
+
+        await self._add_analysis(test_session, test_user, "First")
+        assert await service._get_analysis_context(test_user.id) is None
+
+        invalidate_analysis_context(test_user.id)
+        context = await service._get_analysis_context(test_user.id)
+        assert context["website_title"] == "First"
+        assert context["overall_score"] == 70
+
+
+class TestRecentMessages:
+    """Tests for loading recent conversation history."""
+
+    async def test_returns_last_messages_oldest_first(
+        self, test_session: AsyncSession, test_user: User
+    ):
+        """Should return only the newest n messages, in chronological order."""
+        conversation = Conversation(user_id=test_user.id)
+        test_session.add(conversation)
+        await test_session.flush()
+        start = datetime.utcnow()
+        for i in range(12):
+            test_session.add(Message(
+                conversation_id=conversation.id,
+                role=MessageRole.USER,
+                content=f"message {i}",
+                created_at=start + timedelta(seconds=i),
+            ))
+        await test_session.commit()
+
+        history = await AIService(test_session)._recent_messages(conversation.id)
+
+        assert [m.content for m in history] == [f"message {i}" for i in range(2, 12)]
+
+
+class TestTriePattern:
+    """Tests for the prefix-factored keyword regex."""
+
+    def test_matches_exactly_the_given_words(self):
+        """Should match every word and nothing else."""
+        words = ["seo", "social", "work", "working", "not working"]
+        pattern = re.compile(f"^(?:{_trie_pattern(words)})$")
+
+        assert all(pattern.match(word) for word in words)
+        assert not pattern.match("so")
+        assert not pattern.match("worki")
+
+
+class TestBuildOptimizedRagContext:
+    """Tests for phase-specific RAG context."""
+
+    def _context(self, **overrides) -> dict:
+        context = {
+            "website_url": "https://example.com",
+            "website_title": "Example Bikes",
+            "website_headings": ["Custom builds"],
+            "overall_score": 72,
+            "scores": {"seo": 60},
+            "quick_wins": ["Add a meta description"],
+        }
+        context.update(overrides)
+        return context
+
+    def test_sections_follow_phase(self):
+        """Should include only the sections relevant to the phase."""
+        core = "".join(b["text"] for b in build_optimized_rag_context(self._context(), RingPhase.CORE, []))
+        plan = "".join(b["text"] for b in build_optimized_rag_context(self._context(), RingPhase.PLAN, []))
+
+        assert "Custom builds" in core and "QUICK WINS" not in core
+        assert "Custom builds" not in plan and "Add a meta description" in plan
+
+    def test_cached_per_analysis_version(self):
+        """Should reuse sections for the same analysis version, in fresh blocks."""
+        version = (uuid4(), datetime.utcnow())
+        first = build_optimized_rag_context(
+            self._context(analysis_version=version), RingPhase.DISCOVER, []
+        )
+        # Same version, so the cached sections are served without a rebuild
+        second = build_optimized_rag_context(
+            self._context(analysis_version=version, overall_score=90), RingPhase.DISCOVER, []
+        )
+        changed = build_optimized_rag_context(
+            self._context(analysis_version=(version[0], datetime.utcnow()), overall_score=90),
+            RingPhase.DISCOVER,
+            [],
+        )
+
+        assert first == second and first is not second
+        assert first[0] is not second[0]
+        assert "Overall: 90/100" in "".join(b["text"] for b in changed)
+
+    def test_unversioned_context_is_built_directly(self):
+        """Contexts without an analysis version should always reflect their content."""
+        changed = build_optimized_rag_context(
+            self._context(overall_score=90), RingPhase.DISCOVER, []
+        )
+
+        assert "Overall: 90/100" in "".join(b["text"] for b in changed)
+
+
+class TestBuildMessages:
+    """Tests for LLM message construction."""
+
+    def _conversation(self, **overrides) -> SimpleNamespace:
+        values = {
+            "ring_phase": RingPhase.DISCOVER,
+            "business_context": None,
+        }
+        values.update(overrides)
+        return SimpleNamespace(**values)
+
+    def _preprocessing(self, enrichment_notes: list[str]) -> PreprocessResult:
+        return PreprocessResult(
+            original_message="Hi",
+            intent="statement",
+            sentiment="neutral",
+            references_previous=False,
+            message_length="short",
+            enrichment_notes=enrichment_notes,
+        )
+
+    def test_static_prompt_is_first_block(self):
+        """The phase prompt should lead the system message unchanged."""
+        messages = AIService(db=None)._build_messages(
+            conversation=self._conversation(business_context="We sell bikes"),
+            history=[],
+            user_message="Hi",
+            preprocessing=self._preprocessing(["User gave a brief response"]),
+            rag_context=[{"type": "text", "text": "BUSINESS WEBSITE: https://example.com"}],
+        )
+
+        system_blocks = messages[0]["content"]
+        assert len(system_blocks) == 1
+        assert system_blocks[0]["text"] == SYSTEM_PROMPTS[RingPhase.DISCOVER]
+        assert system_blocks[0]["cache_control"] == {"type": "ephemeral"}
+        assert "We sell bikes" not in system_blocks[0]["text"]
+        assert messages[-1] == {"role": "user", "content": "Hi"}
+
+    def test_no_dynamic_context_sends_only_static_prompt(self):
+        """Without per-turn context there should be no extra system message."""
+        messages = AIService(db=None)._build_messages(
+            conversation=self._conversation(),
+            history=[],
+            user_message="Hi",
+            preprocessing=self._preprocessing([]),
+            rag_context=[],
+        )
+
+        assert [m["role"] for m in messages] == ["system", "user"]
+        assert messages[0]["content"][0]["text"] is SYSTEM_PROMPTS[RingPhase.DISCOVER]
+
+    def test_dynamic_context_follows_cached_history(self):
+        """Per-turn context should come after the history, which ends with a cache marker."""
+        history = [
+            SimpleNamespace(role=MessageRole.USER, content="We sell bikes", created_at=1),
+            SimpleNamespace(role=MessageRole.ASSISTANT, content="Tell me more", created_at=2),
+        ]
+        messages = AIService(db=None)._build_messages(
+            conversation=self._conversation(business_context="Bike shop"),
+            history=history,
+            user_message="Hi",
+            preprocessing=self._preprocessing(["User gave a brief response"]),
+            rag_context=[{"type": "text", "text": "BUSINESS WEBSITE: https://example.com"}],
+        )
+
+        assert len(messages[0]["content"]) == 1
+        assert messages[1] == {"role": "user", "content": "We sell bikes"}
+        assert messages[2]["content"] == [{
+            "type": "text",
+            "text": "Tell me more",
+            "cache_control": {"type": "ephemeral"},
+        }]
+
+        context = "".join(block["text"] for block in messages[3]["content"])
+        assert messages[3]["role"] == "system"
+        assert "BUSINESS WEBSITE" in context
+        assert "Bike shop" in context
+        assert "User gave a brief response" in context
+        assert messages[4] == {"role": "user", "content": "Hi"}
@@ -4,8 +4,24 @@ Authentication API Tests
 AI App Development powered by ServiceVision (https://www.servicevision.net)
 """
 
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import uuid4
+
 import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
+from jose import jwt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import security
+from app.core.exceptions import AuthenticationError
+from app.config import settings
+from app.core.security import _encode_jwt, create_access_token, decode_token
+from app.models.user import User
+from app.schemas.auth import UserLogin
+from app.services import auth_service
+from app.services.auth_service import AuthService
 
 
 class TestUserRegistration:
@@ -50,56 +66,36 @@ class TestUserRegistration:
         assert response.status_code == 422
 
     @pytest.mark.asyncio
-    async def test_register_weak_password_no_special(
-        self, client: AsyncClient, invalid_password_data: dict
+    @pytest.mark.parametrize(
+        "password,expected_message",
+        [
+            ("weakpassword123", "special character"),  # No special character
+            ("WeakPassword!", "number"),  # No number
+            ("Sh0rt!", None),  # Too short
+        ],
+    )
+    async def test_register_weak_password(
+        self, client: AsyncClient, password: str, expected_message: Optional[str]
     ):
-        """Should reject password without special character."""
-        response = await client.post(
-            "/api/v1/auth/register", json=invalid_password_data
-        )
-
-        assert response.status_code == 422
-        assert "special character" in response.text.lower()
-
-    @pytest.mark.asyncio
-    async def test_register_weak_password_no_number(self, client: AsyncClient):
-        """Should reject password without number."""
-        data = {
-            "email": "test@example.com",
-            "password": "WeakPassword!",  # No number
-        }
-        response = await client.post("/api/v1/auth/register", json=data)
-
-        assert response.status_code == 422
-        assert "number" in response.text.lower()
-
-    @pytest.mark.asyncio
-    async def test_register_short_password(self, client: AsyncClient):
-        """Should reject password shorter than 8 characters."""
+        """Should reject passwords that don't meet the strength rules."""
         data = {
             "email": "test@example.com",
-            "password": "Sh0rt!",  # Too short
+            "password": password,
         }
         response = await client.post("/api/v1/auth/register", json=data)
 
         assert response.status_code == 422
+        if expected_message:
+            assert expected_message in response.text.lower()
 
 
 class TestUserLogin:
     """Tests for user login endpoint."""
 
     @pytest.mark.asyncio
-    async def test_login_success(self, client: AsyncClient, valid_user_data: dict):
+    async def test_login_success(self, client: AsyncClient, registered_user: dict):
         """Should successfully login with valid credentials."""
-        # Register first
-        await client.post("/api/v1/auth/register", json=valid_user_data)
-
-        # Login
-        login_data = {
-            "email": valid_user_data["email"],
-            "password": valid_user_data["password"],
-        }
-        response = await client.post("/api/v1/auth/login", json=login_data)
+        response = await client.post("/api/v1/auth/login", json=registered_user["data"])
 
         assert response.status_code == 200
         data = response.json()
@@ -107,17 +103,59 @@ class TestUserLogin:
         assert "tokens" in data["data"]
         assert "access_token" in data["data"]["tokens"]
 
+    @pytest.mark.asyncio
+    async def test_login_records_last_login(
+        self, test_session: AsyncSession, registered_user: dict
+    ):
+        """Should store the login time on the user."""
+        credentials = registered_user["data"]
+        service = AuthService(test_session)
+
+        user = await service.authenticate_user(UserLogin(**credentials))
+
+        assert user.last_login is not None
+        test_session.expire(user)
+        assert (await service.get_user_by_email(credentials["email"])).last_login is not None
+
+    @pytest.mark.asyncio
+    async def test_unknown_email_still_verifies_a_hash(
+        self, test_session: AsyncSession, monkeypatch
+    ):
+        """Should spend a password verification on unknown emails too."""
+        verified = []
+        real_verify = auth_service.verify_password
+
+        def counting_verify(password, hashed_password):
+            verified.append(hashed_password)
+            return real_verify(password, hashed_password)
+
+        monkeypatch.setattr(auth_service, "verify_password", counting_verify)
+
+        with pytest.raises(AuthenticationError):
+            await AuthService(test_session).authenticate_user(
+                UserLogin(email="nobody@example.com", password="Whatever123!")
+            )
+
+        assert verified == [auth_service._DUMMY_HASH]
+
+    @pytest.mark.asyncio
+    async def test_user_without_password_is_rejected(self, test_session: AsyncSession):
+        """Should reject password logins for accounts without a password (e.g. Clerk)."""
+        test_session.add(User(email="clerk@example.com", clerk_id="user_1", hashed_password=""))
+        await test_session.commit()
+
+        with pytest.raises(AuthenticationError):
+            await AuthService(test_session).authenticate_user(
+                UserLogin(email="clerk@example.com", password="Whatever123!")
+            )
+
     @pytest.mark.asyncio
     async def test_login_wrong_password(
-        self, client: AsyncClient, valid_user_data: dict
+        self, client: AsyncClient, registered_user: dict
     ):
         """Should reject login with wrong password."""
-        # Register first
-        await client.post("/api/v1/auth/register", json=valid_user_data)
-
-        # Login with wrong password
         login_data = {
-            "email": valid_user_data["email"],
+            "email": registered_user["data"]["email"],
             "password": "WrongPassword123!",
         }
         response = await client.post("/api/v1/auth/login", json=login_data)
@@ -171,16 +209,11 @@ class TestTokenRefresh:
 
     @pytest.mark.asyncio
     async def test_refresh_token_success(
-        self, client: AsyncClient, valid_user_data: dict
+        self, client: AsyncClient, registered_user: dict
     ):
         """Should successfully refresh tokens."""
-        # Register and get refresh token
-        register_response = await client.post(
-            "/api/v1/auth/register", json=valid_user_data
-        )
-        refresh_token = register_response.json()["data"]["tokens"]["refresh_token"]
+        refresh_token = registered_user["tokens"]["refresh_token"]
 
-        # Refresh tokens
         response = await client.post(
             "/api/v1/auth/refresh",
             json={"refresh_token": refresh_token},
@@ -225,16 +258,12 @@ class TestPasswordReset:
 
     @pytest.mark.asyncio
     async def test_request_password_reset(
-        self, client: AsyncClient, valid_user_data: dict
+        self, client: AsyncClient, registered_user: dict
     ):
         """Should accept password reset request."""
-        # Register first
-        await client.post("/api/v1/auth/register", json=valid_user_data)
-
-        # Request reset
         response = await client.post(
             "/api/v1/auth/password-reset/request",
-            json={"email": valid_user_data["email"]},
+            json={"email": registered_user["data"]["email"]},
         )
 
         assert response.status_code == 200
@@ -251,3 +280,120 @@ class TestPasswordReset:
 
         # Should still return 200 to prevent enumeration
         assert response.status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_confirm_password_reset_with_issued_token(
+        self, client: AsyncClient, test_session: AsyncSession, registered_user: dict
+    ):
+        """Should reset the password with the issued token and allow it only once."""
+        email = registered_user["data"]["email"]
+        token = await AuthService(test_session).request_password_reset(email)
+
+        payload = {"token": token, "password": "BrandNewPassword456!"}
+        response = await client.post("/api/v1/auth/password-reset/confirm", json=payload)
+        assert response.status_code == 200
+
+        login = await client.post(
+            "/api/v1/auth/login",
+            json={"email": email, "password": "BrandNewPassword456!"},
+        )
+        assert login.status_code == 200
+
+        response = await client.post("/api/v1/auth/password-reset/confirm", json=payload)
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_confirm_password_reset_rejects_wrong_verifier(
+        self, client: AsyncClient, test_session: AsyncSession, registered_user: dict
+    ):
+        """Should reject a token whose selector matches but whose verifier does not."""
+        token = await AuthService(test_session).request_password_reset(
+            registered_user["data"]["email"]
+        )
+        tampered = token[:-1] + ("A" if token[-1] != "A" else "B")
+
+        for bad_token in (tampered, token[:10], ""):
+            response = await client.post(
+                "/api/v1/auth/password-reset/confirm",
+                json={"token": bad_token, "password": "BrandNewPassword456!"},
+            )
+            assert response.status_code == 400
+
+
+class TestEncodeJwt:
+    """Tests for the HS256 token encoder."""
+
+    def test_matches_jose_encoding(self):
+        """Should produce exactly the token jose would for the same claims."""
+        issued = datetime(2026, 1, 1, 12, 0, 0)
+        claims = {
+            "sub": str(uuid4()),
+            "exp": issued + timedelta(minutes=15),
+            "type": "access",
+            "iat": issued,
+            "email": "someone@example.com",
+        }
+
+        expected = jwt.encode(dict(claims), settings.JWT_SECRET_KEY, algorithm="HS256")
+
+        assert _encode_jwt(dict(claims)) == expected
+
+
+class TestTokenSubject:
+    """Tests for the user ID subject claim."""
+
+    def test_user_id_is_issued_as_hex_and_decoded_as_uuid(self):
+        """Should write user IDs as hex and hand them back as UUIDs."""
+        user_id = uuid4()
+        token = create_access_token(subject=user_id)
+
+        assert jwt.get_unverified_claims(token)["sub"] == user_id.hex
+        assert decode_token(token)["sub"] == user_id
+
+    def test_dashed_subject_from_older_tokens_still_parses(self):
+        """Should accept tokens issued with the dashed UUID form."""
+        user_id = uuid4()
+        token = create_access_token(subject=str(user_id))
+
+        assert decode_token(token)["sub"] == user_id
+
+
+class TestDecodeTokenCache:
+    """Tests for the verified-claims cache in front of decode_token."""
+
+    def test_repeated_token_is_verified_once(self, monkeypatch):
+        """Should verify a token's signature once and serve repeats from the cache."""
+        calls = []
+        real_decode = security.jwt.decode
+
+        def counting_decode(*args, **kwargs):
+            calls.append(args[0])
+            return real_decode(*args, **kwargs)
+
+        monkeypatch.setattr(security.jwt, "decode", counting_decode)
+        token = create_access_token(subject="cache-user")
+
+        first = decode_token(token)
+        first["sub"] = "mutated"
+        second = decode_token(token)
+
+        assert second["sub"] == "cache-user"
+        assert len(calls) == 1
+
+    def test_invalid_token_is_rejected_from_cache(self, monkeypatch):
+        """Should keep rejecting a bad token without re-verifying it."""
+        calls = []
+        real_decode = security.jwt.decode
+
+        def counting_decode(*args, **kwargs):
+            calls.append(args[0])
+            return real_decode(*args, **kwargs)
+
+        monkeypatch.setattr(security.jwt, "decode", counting_decode)
+
+        for _ in range(3):
+            with pytest.raises(HTTPException) as exc_info:
+                decode_token("not-a-jwt")
+            assert exc_info.value.status_code == 401
+
+        assert len(calls) == 1
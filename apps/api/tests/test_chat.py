@@ -4,10 +4,30 @@ Chat API Tests
 AI App Development powered by ServiceVision (https://www.servicevision.net)
 """
 
+import json
+from types import SimpleNamespace
+
 import pytest
+import pytest_asyncio
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from uuid import uuid4
 
+from app.api.v1.chat import ConnectionManager
+from app.core.exceptions import NotFoundError
+from app.models.conversation import Conversation
+from app.schemas.chat import ConversationCreate
+from app.services.chat_service import ChatService
+
+
+@pytest_asyncio.fixture
+async def conversation_id(test_session: AsyncSession, test_user) -> str:
+    """Create a conversation owned by the test user, without an API round trip."""
+    conversation = await ChatService(test_session).create_conversation(
+        test_user.id, ConversationCreate(title="Test Conversation")
+    )
+    return str(conversation.id)
+
 
 class TestCreateConversation:
     """Tests for conversation creation."""
@@ -77,15 +97,15 @@ class TestListConversations:
 
     @pytest.mark.asyncio
     async def test_list_conversations_with_pagination(
-        self, authenticated_client: AsyncClient
+        self, authenticated_client: AsyncClient, test_session: AsyncSession, test_user
     ):
         """Should respect pagination parameters."""
-        # Create a few conversations
-        for i in range(3):
-            await authenticated_client.post(
-                "/api/v1/chat/conversations",
-                json={"title": f"Conversation {i}"},
-            )
+        # Seed a few conversations directly; only the list endpoint is under test
+        test_session.add_all(
+            Conversation(user_id=test_user.id, title=f"Conversation {i}")
+            for i in range(3)
+        )
+        await test_session.commit()
 
         # Get with limit
         response = await authenticated_client.get(
@@ -94,22 +114,42 @@ class TestListConversations:
 
         assert response.status_code == 200
         data = response.json()
-        assert len(data["data"]) <= 2
+        assert len(data["data"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_list_conversations_includes_message_counts(
+        self, authenticated_client: AsyncClient
+    ):
+        """Should report each conversation's message count, newest first."""
+        first = await authenticated_client.post(
+            "/api/v1/chat/conversations", json={"title": "First"}
+        )
+        second = await authenticated_client.post(
+            "/api/v1/chat/conversations", json={"title": "Second"}
+        )
+        await authenticated_client.post(
+            f"/api/v1/chat/conversations/{first.json()['data']['id']}/messages",
+            json={"content": "Hello!"},
+        )
+
+        response = await authenticated_client.get("/api/v1/chat/conversations")
+
+        counts = {c["id"]: c["message_count"] for c in response.json()["data"]}
+        assert counts == {
+            first.json()["data"]["id"]: 3,  # welcome, user message, reply
+            second.json()["data"]["id"]: 1,  # welcome only
+        }
+        assert response.json()["data"][0]["title"] == "First"
 
 
 class TestGetConversation:
     """Tests for getting single conversation."""
 
     @pytest.mark.asyncio
-    async def test_get_conversation_success(self, authenticated_client: AsyncClient):
+    async def test_get_conversation_success(
+        self, authenticated_client: AsyncClient, conversation_id: str
+    ):
         """Should get conversation by ID."""
-        # Create conversation
-        create_response = await authenticated_client.post(
-            "/api/v1/chat/conversations",
-            json={"title": "Test Conversation"},
-        )
-        conversation_id = create_response.json()["data"]["id"]
-
         # Get conversation
         response = await authenticated_client.get(
             f"/api/v1/chat/conversations/{conversation_id}"
@@ -136,15 +176,10 @@ class TestSendMessage:
     """Tests for sending messages."""
 
     @pytest.mark.asyncio
-    async def test_send_message_success(self, authenticated_client: AsyncClient):
+    async def test_send_message_success(
+        self, authenticated_client: AsyncClient, conversation_id: str
+    ):
         """Should send message to conversation."""
-        # Create conversation
-        create_response = await authenticated_client.post(
-            "/api/v1/chat/conversations",
-            json={"title": "Test Conversation"},
-        )
-        conversation_id = create_response.json()["data"]["id"]
-
         # Send message
         response = await authenticated_client.post(
             f"/api/v1/chat/conversations/{conversation_id}/messages",
@@ -160,17 +195,55 @@ class TestSendMessage:
         assert "assistant_message" in data["data"]
 
     @pytest.mark.asyncio
-    async def test_send_message_empty_content(
-        self, authenticated_client: AsyncClient
+    async def test_send_message_persists_both_messages(
+        self, authenticated_client: AsyncClient, conversation_id: str
     ):
-        """Should reject empty message content."""
-        # Create conversation
-        create_response = await authenticated_client.post(
-            "/api/v1/chat/conversations",
-            json={"title": "Test Conversation"},
+        """Should save the user message and AI response together, in order."""
+        response = await authenticated_client.post(
+            f"/api/v1/chat/conversations/{conversation_id}/messages",
+            json={"content": "Hello, AI!"},
         )
-        conversation_id = create_response.json()["data"]["id"]
+        sent = response.json()["data"]
+
+        response = await authenticated_client.get(
+            f"/api/v1/chat/conversations/{conversation_id}/messages"
+        )
+        messages = response.json()["data"]
+
+        assert [m["role"] for m in messages] == ["assistant", "user", "assistant"]
+        assert messages[1]["id"] == sent["user_message"]["id"]
+        assert messages[1]["content"] == "Hello, AI!"
+        assert messages[2]["id"] == sent["assistant_message"]["id"]
+
+    @pytest.mark.asyncio
+    async def test_send_message_sends_user_content_once(
+        self, authenticated_client: AsyncClient, conversation_id: str, monkeypatch
+    ):
+        """Should send the new user message to the model once, not also as history."""
+        sent_messages = []
+
+        async def fake_acompletion(**kwargs):
+            sent_messages.append(kwargs["messages"])
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="Tell me more."))]
+            )
+
+        monkeypatch.setattr("app.services.ai_service.acompletion", fake_acompletion)
 
+        await authenticated_client.post(
+            f"/api/v1/chat/conversations/{conversation_id}/messages",
+            json={"content": "We sell handmade bikes"},
+        )
+
+        contents = [json.dumps(m["content"]) for m in sent_messages[0]]
+        assert sum("We sell handmade bikes" in c for c in contents) == 1
+        assert sent_messages[0][-1] == {"role": "user", "content": "We sell handmade bikes"}
+
+    @pytest.mark.asyncio
+    async def test_send_message_empty_content(
+        self, authenticated_client: AsyncClient, conversation_id: str
+    ):
+        """Should reject empty message content."""
         # Send empty message
         response = await authenticated_client.post(
             f"/api/v1/chat/conversations/{conversation_id}/messages",
@@ -193,19 +266,94 @@ class TestSendMessage:
         assert response.status_code == 404
 
 
-class TestGetMessages:
-    """Tests for getting conversation messages."""
+class TestStreamMessage:
+    """Tests for the streaming send-message endpoint."""
 
     @pytest.mark.asyncio
-    async def test_get_messages_success(self, authenticated_client: AsyncClient):
-        """Should get messages from conversation."""
-        # Create conversation
+    async def test_streams_response_and_saves_turn(
+        self,
+        authenticated_client: AsyncClient,
+        test_session: AsyncSession,
+        test_engine,
+        monkeypatch,
+    ):
+        """Should stream the user message, response deltas, then the saved reply."""
+        async def fake_acompletion(**kwargs):
+            async def stream():
+                for delta in ["AI: What do ", "your customers ", "value most?"]:
+                    yield SimpleNamespace(
+                        choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))]
+                    )
+            return stream()
+
+        monkeypatch.setattr("app.services.ai_service.acompletion", fake_acompletion)
+        monkeypatch.setattr("app.services.ai_service.settings.STREAM_COALESCE_CHARS", 1)
+        monkeypatch.setattr(
+            "app.db.database.async_session_factory",
+            async_sessionmaker(test_engine, expire_on_commit=False),
+        )
+
         create_response = await authenticated_client.post(
             "/api/v1/chat/conversations",
             json={"title": "Test Conversation"},
         )
         conversation_id = create_response.json()["data"]["id"]
 
+        response = await authenticated_client.post(
+            f"/api/v1/chat/conversations/{conversation_id}/messages/stream",
+            json={"content": "Hello, AI!"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [
+            json.loads(line[len("data: "):])
+            for line in response.text.split("\n\n") if line
+        ]
+        assert [e["type"] for e in events] == [
+            "user_message", "delta", "delta", "delta", "done", "session_update"
+        ]
+        assert events[0]["message"]["content"] == "Hello, AI!"
+        streamed = "".join(e["content"] for e in events if e["type"] == "delta")
+        assert streamed == "AI: What do your customers value most?"
+        # The saved reply is post-processed like a non-streamed one
+        reply = "What do your customers value most?"
+        assert events[-2]["assistant_message"]["content"] == reply
+        assert events[-1]["session_update"]["ring_phase"] == "core"
+
+        # The turn was written by the stream's own session
+        test_session.expire_all()
+        messages = (await authenticated_client.get(
+            f"/api/v1/chat/conversations/{conversation_id}/messages"
+        )).json()["data"]
+        assert [m["content"] for m in messages[1:]] == ["Hello, AI!", reply]
+
+    @pytest.mark.asyncio
+    async def test_stream_to_nonexistent_conversation(
+        self, authenticated_client: AsyncClient, test_engine, monkeypatch
+    ):
+        """Should return 404 before streaming when the conversation doesn't exist."""
+        monkeypatch.setattr(
+            "app.db.database.async_session_factory",
+            async_sessionmaker(test_engine, expire_on_commit=False),
+        )
+
+        response = await authenticated_client.post(
+            f"/api/v1/chat/conversations/{uuid4()}/messages/stream",
+            json={"content": "Hello!"},
+        )
+
+        assert response.status_code == 404
+
+
+class TestGetMessages:
+    """Tests for getting conversation messages."""
+
+    @pytest.mark.asyncio
+    async def test_get_messages_success(
+        self, authenticated_client: AsyncClient, conversation_id: str
+    ):
+        """Should get messages from conversation."""
         # Send a message
         await authenticated_client.post(
             f"/api/v1/chat/conversations/{conversation_id}/messages",
@@ -242,15 +390,10 @@ class TestRingPhase:
         assert data["data"]["ring_phase"] == "core"
 
     @pytest.mark.asyncio
-    async def test_update_ring_phase(self, authenticated_client: AsyncClient):
+    async def test_update_ring_phase(
+        self, authenticated_client: AsyncClient, conversation_id: str
+    ):
         """Should be able to update ring phase."""
-        # Create conversation
-        create_response = await authenticated_client.post(
-            "/api/v1/chat/conversations",
-            json={"title": "Test Conversation"},
-        )
-        conversation_id = create_response.json()["data"]["id"]
-
         # Update ring phase (correct endpoint uses /ring suffix with query param)
         response = await authenticated_client.patch(
             f"/api/v1/chat/conversations/{conversation_id}/ring?ring_phase=discover",
@@ -266,30 +409,58 @@ class TestConversationIsolation:
 
     @pytest.mark.asyncio
     async def test_user_cannot_access_other_user_conversation(
-        self,
-        client: AsyncClient,
-        authenticated_client: AsyncClient,
-        valid_user_data: dict,
+        self, second_user_client: AsyncClient, conversation_id: str
     ):
         """User should not be able to access another user's conversation."""
-        # Create conversation with first user
-        create_response = await authenticated_client.post(
-            "/api/v1/chat/conversations",
-            json={"title": "Private Conversation"},
-        )
-        conversation_id = create_response.json()["data"]["id"]
-
-        # Register second user
-        second_user_data = {**valid_user_data, "email": "second@example.com"}
-        register_response = await client.post(
-            "/api/v1/auth/register", json=second_user_data
-        )
-        second_token = register_response.json()["data"]["tokens"]["access_token"]
-
-        # Try to access first user's conversation
-        client.headers["Authorization"] = f"Bearer {second_token}"
-        response = await client.get(
+        response = await second_user_client.get(
             f"/api/v1/chat/conversations/{conversation_id}"
         )
 
         assert response.status_code == 404  # Not found for this user
+
+
+class TestAddMessage:
+    """Tests for ChatService.add_message."""
+
+    @pytest.mark.asyncio
+    async def test_add_message_checks_ownership(self, test_session: AsyncSession, test_user):
+        """Should add messages to the user's conversation and refuse anyone else's."""
+        service = ChatService(test_session)
+        conversation = await service.create_conversation(test_user.id)
+
+        message = await service.add_message(conversation.id, test_user.id, "Hi there")
+        assert message.conversation_id == conversation.id
+        assert message.content == "Hi there"
+        [listed] = await service.list_conversations(test_user.id)
+        assert listed.message_count == 2  # welcome message and this one
+
+        with pytest.raises(NotFoundError):
+            await service.add_message(conversation.id, uuid4(), "Not mine")
+        with pytest.raises(NotFoundError):
+            await service.add_message(uuid4(), test_user.id, "Nowhere")
+
+
+class TestConnectionManager:
+    """Tests for WebSocket broadcasting."""
+
+    @pytest.mark.asyncio
+    async def test_send_message_broadcasts_json_text(self):
+        """Should send the same JSON text to every connection of the conversation."""
+        class FakeWebSocket:
+            def __init__(self):
+                self.sent: list[str] = []
+
+            async def send_text(self, text: str):
+                self.sent.append(text)
+
+        conversation_id = uuid4()
+        sockets = [FakeWebSocket(), FakeWebSocket()]
+        manager = ConnectionManager()
+        manager.active_connections[conversation_id] = list(sockets)
+
+        await manager.broadcast_typing(conversation_id, True)
+
+        for socket in sockets:
+            assert [json.loads(text) for text in socket.sent] == [
+                {"type": "typing", "is_typing": True}
+            ]
@@ -0,0 +1,262 @@
+"""
+Strategy Service Tests
+
+AI App Development powered by ServiceVision (https://www.servicevision.net)
+"""
+
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.exceptions import NotFoundError
+from app.models.analysis import Analysis
+from app.models.strategy import Strategy, ActionItem, ActionStatus, StrategyStatus
+from app.models.user import User
+from app.schemas.strategy import ActionItemUpdate, StrategyGenerateRequest
+from app.services.strategy_service import (
+    Scores,
+    StrategyService,
+    start_strategy_workers,
+    stop_strategy_workers,
+)
+
+
+@pytest_asyncio.fixture
+async def test_strategy(test_session: AsyncSession, test_user: User) -> Strategy:
+    """Create a test strategy."""
+    strategy = Strategy(user_id=test_user.id, title="Growth Strategy")
+    test_session.add(strategy)
+    await test_session.commit()
+    return strategy
+
+
+class TestGenerateActionItems:
+    """Tests for action item generation."""
+
+    @pytest.mark.asyncio
+    async def test_inserts_items_for_weak_areas(
+        self, test_session: AsyncSession, test_strategy: Strategy
+    ):
+        """Should insert the action items for every low-scoring area."""
+        service = StrategyService(test_session)
+        scores = Scores(seo=40, content=90, mobile=50, speed=90, social=90)
+
+        await service._generate_action_items(test_session, test_strategy.id, scores)
+
+        items = (
+            await test_session.execute(
+                select(ActionItem).where(ActionItem.strategy_id == test_strategy.id)
+            )
+        ).scalars().all()
+        assert sorted(item.category for item in items) == [
+            "Mobile", "Mobile", "SEO", "SEO", "SEO",
+        ]
+        assert len({item.id for item in items}) == 5
+        assert all(item.status == ActionStatus.PENDING for item in items)
+
+    @pytest.mark.asyncio
+    async def test_no_items_when_scores_are_high(
+        self, test_session: AsyncSession, test_strategy: Strategy
+    ):
+        """Should insert nothing when every area scores well."""
+        service = StrategyService(test_session)
+        scores = Scores(seo=90, content=90, mobile=90, speed=90, social=90)
+
+        await service._generate_action_items(test_session, test_strategy.id, scores)
+
+        items = (await test_session.execute(select(ActionItem))).scalars().all()
+        assert items == []
+
+
+class TestGenerateStrategyContent:
+    """Tests for strategy content generation."""
+
+    @pytest.mark.asyncio
+    async def test_writes_content_and_marks_ready(
+        self, test_session: AsyncSession, test_strategy: Strategy
+    ):
+        """Should store the generated content and mark the strategy ready."""
+        analysis_snapshot = {
+            "website_url": "https://example.com",
+            "results": {
+                "overall_score": 55,
+                "scores": {"seo": 40, "content": 90, "mobile": 90, "speed": 90, "social": 90},
+            },
+        }
+
+        await StrategyService(test_session)._generate_strategy_content(
+            test_strategy.id, analysis_snapshot
+        )
+
+        await test_session.refresh(test_strategy)
+        assert test_strategy.status == StrategyStatus.READY
+        assert "https://example.com" in test_strategy.executive_summary
+        items = (await test_session.execute(select(ActionItem))).scalars().all()
+        assert {item.category for item in items} == {"SEO"}
+        assert "SEO optimization needs work" in test_strategy.critical_gaps
+        assert test_strategy.recommendations[0]["id"] == "seo-optimization"
+
+    @pytest.mark.asyncio
+    async def test_marks_failed_on_error(
+        self, test_session: AsyncSession, test_strategy: Strategy
+    ):
+        """Should mark the strategy failed when generation raises."""
+        analysis_snapshot = {"website_url": "https://example.com", "results": {"scores": None}}
+
+        await StrategyService(test_session)._generate_strategy_content(
+            test_strategy.id, analysis_snapshot
+        )
+
+        await test_session.refresh(test_strategy)
+        assert test_strategy.status == StrategyStatus.FAILED
+        assert test_strategy.executive_summary is None
+
+
+class TestGenerateStrategy:
+    """Tests for strategy generation requests."""
+
+    @pytest.mark.asyncio
+    async def test_worker_generates_queued_strategy(
+        self, test_session: AsyncSession, test_engine, test_user: User, monkeypatch
+    ):
+        """Should hand the strategy to a worker that fills it in."""
+        monkeypatch.setattr(
+            "app.db.database.async_session_factory",
+            async_sessionmaker(test_engine, expire_on_commit=False),
+        )
+        analysis = Analysis(
+            user_id=test_user.id,
+            website_url="https://example.com",
+            results={"overall_score": 90, "scores": {"seo": 90, "content": 90, "mobile": 90}},
+        )
+        test_session.add(analysis)
+        await test_session.commit()
+        service = StrategyService(test_session)
+
+        try:
+            strategy = await service.generate_strategy(
+                test_user.id, StrategyGenerateRequest(analysis_id=analysis.id)
+            )
+            assert strategy.status == StrategyStatus.GENERATING
+            await start_strategy_workers().join()
+        finally:
+            stop_strategy_workers()
+
+        await test_session.refresh(strategy)
+        assert strategy.status == StrategyStatus.READY
+
+
+class TestUpdateActionItem:
+    """Tests for action item updates."""
+
+    @pytest_asyncio.fixture
+    async def action_item(self, test_session: AsyncSession, test_strategy: Strategy) -> ActionItem:
+        """Create an action item on the test strategy."""
+        item = ActionItem(strategy_id=test_strategy.id, title="Add viewport meta tag")
+        test_session.add(item)
+        await test_session.commit()
+        return item
+
+    @pytest.mark.asyncio
+    async def test_owner_can_complete(
+        self, test_session: AsyncSession, test_user: User, action_item: ActionItem
+    ):
+        """Should update the status of the owner's action item."""
+        service = StrategyService(test_session)
+
+        action = await service.update_action_item(
+            test_user.id,
+            ActionItemUpdate(action_id=action_item.id, status=ActionStatus.COMPLETED),
+        )
+
+        assert action.status == ActionStatus.COMPLETED
+        assert action.completed_at is not None
+
+    @pytest.mark.asyncio
+    async def test_other_user_not_found(
+        self, test_session: AsyncSession, action_item: ActionItem
+    ):
+        """Should not find another user's action item."""
+        service = StrategyService(test_session)
+
+        with pytest.raises(NotFoundError):
+            await service.update_action_item(
+                uuid4(),
+                ActionItemUpdate(action_id=action_item.id, status=ActionStatus.COMPLETED),
+            )
+
+
+class TestIdentifyGaps:
+    """Tests for critical gap identification."""
+
+    def test_skips_duplicate_issues(self, test_session: AsyncSession):
+        """Should list each content issue once, ignoring case."""
+        service = StrategyService(test_session)
+        scores = Scores(seo=40, content=90, mobile=90, speed=90, social=90)
+        results = {
+            "content_analysis": {
+                "issues": ["thin content", "SEO optimization needs work", "Thin content"],
+            },
+        }
+
+        gaps = service._identify_gaps(scores, results)
+
+        assert gaps == ["SEO optimization needs work", "Thin content"]
+
+
+class TestGetStrategyResponse:
+    """Tests for building strategy responses."""
+
+    @pytest.mark.asyncio
+    async def test_reuses_response_until_strategy_changes(
+        self, test_session: AsyncSession, test_user: User, test_strategy: Strategy
+    ):
+        """Should serve the cached response until an action item changes."""
+        item = ActionItem(strategy_id=test_strategy.id, title="Add viewport meta tag")
+        test_session.add(item)
+        await test_session.commit()
+        service = StrategyService(test_session)
+
+        first = await service.get_strategy_response(test_strategy.id, test_user.id)
+        assert await service.get_strategy_response(test_strategy.id, test_user.id) is first
+
+        await service.update_action_item(
+            test_user.id, ActionItemUpdate(action_id=item.id, status=ActionStatus.COMPLETED)
+        )
+        updated = await service.get_strategy_response(test_strategy.id, test_user.id)
+
+        assert updated is not first
+        assert updated.action_items[0].status == ActionStatus.COMPLETED
+
+    @pytest.mark.asyncio
+    async def test_other_user_not_found(
+        self, test_session: AsyncSession, test_user: User, test_strategy: Strategy
+    ):
+        """Should not serve a cached response to another user."""
+        service = StrategyService(test_session)
+        await service.get_strategy_response(test_strategy.id, test_user.id)
+
+        with pytest.raises(NotFoundError):
+            await service.get_strategy_response(test_strategy.id, uuid4())
+
+
+class TestGenerate90DayPriorities:
+    """Tests for 90-day priorities."""
+
+    def test_lowest_scores_first(self, test_session: AsyncSession):
+        """Should prioritize the three lowest scores under 70 after quick wins."""
+        service = StrategyService(test_session)
+        scores = Scores(seo=65, content=30, mobile=90, speed=30, social=50)
+
+        priorities = service._generate_90_day_priorities(scores, {"quick_wins": ["Fix titles"]})
+
+        assert priorities == [
+            "Quick Win: Fix titles",
+            "Improve CONTENT score from 30 to 70+",
+            "Improve SPEED score from 30 to 70+",
+            "Improve SOCIAL score from 50 to 70+",
+            "Establish baseline metrics and tracking",
+        ]